@@ -0,0 +1,129 @@
+# -*- coding: utf-8 -*-
+"""
+Funções Auxiliares Compartilhadas pelos Scripts de Visualização.
+
+Este módulo reúne a configuração do matplotlib e os auxiliares de desenho usados
+pelos scripts de plotagem (plot_sinais_pre_filtrados.py, plot_sinais_filtrados.py,
+plot_final_with_filter.py), para que uma otimização feita aqui valha para todos
+eles de uma só vez.
+"""
+
+import numpy as np
+import matplotlib
+# Backend não interativo: os gráficos são apenas salvos em arquivo, então não há
+# por que procurar/inicializar uma interface gráfica (e o script roda sem display).
+matplotlib.use('Agg')
+# Simplificação de caminhos mais agressiva: vértices que se desviam menos de 1 pixel
+# da linha já desenhada são descartados pelo Agg (o padrão é 1/9 de pixel), e linhas
+# longas são rasterizadas em blocos de 10000 vértices. A resolução (dpi) não muda.
+matplotlib.rcParams.update({
+    'path.simplify': True,
+    'path.simplify_threshold': 1.0,
+    'agg.path.chunksize': 10000,
+})
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+
+__all__ = ["MAX_POINTS_TO_PLOT", "minmax_decimate", "get_clean_axes", "init_plot_worker",
+           "save_figure"]
+
+# --- 1. Configurações ---
+
+# Número máximo de pontos desenhados por curva. A figura de 15 polegadas a 100 dpi
+# tem 1500 pixels de largura, então ~2 pontos por pixel já dão a mesma imagem;
+# acima disso, o sinal é subamostrado apenas para o desenho.
+MAX_POINTS_TO_PLOT = 3000
+
+# --- 2. Funções Auxiliares ---
+
+def minmax_decimate(time_axis, signal_data, max_points=MAX_POINTS_TO_PLOT):
+    """
+    Reduz um sinal 1D a no máximo max_points pontos preservando sua envoltória.
+
+    O sinal é dividido em max_points/2 blocos consecutivos e, de cada bloco, são
+    mantidas apenas as amostras de valor mínimo e máximo, na ordem em que ocorrem,
+    de modo que picos estreitos não desaparecem do desenho. Os instantes de tempo
+    de cada amostra mantida são os originais.
+
+    Args:
+        time_axis (np.array): O eixo do tempo do sinal.
+        signal_data (np.array): O vetor de dados do sinal (1D).
+        max_points (int): O número máximo de pontos a serem desenhados.
+
+    Returns:
+        tuple: Uma tupla (eixo_tempo, sinal) com os pontos a serem desenhados.
+    """
+    n_samples = len(signal_data)
+    if n_samples <= max_points:
+        return time_axis, signal_data
+
+    # Blocos de tamanho fixo; o último é completado repetindo a última amostra,
+    # o que não altera seu mínimo nem seu máximo.
+    bin_size = -(-n_samples // (max_points // 2))
+    n_bins = -(-n_samples // bin_size)
+    padded = np.pad(signal_data, (0, n_bins * bin_size - n_samples), mode='edge').reshape(n_bins, bin_size)
+
+    # Índices (no sinal original) do mínimo e do máximo de cada bloco, em ordem temporal.
+    idx_min = padded.argmin(axis=1)
+    idx_max = padded.argmax(axis=1)
+    idx = np.stack([np.minimum(idx_min, idx_max), np.maximum(idx_min, idx_max)], axis=1)
+    idx += np.arange(0, n_bins * bin_size, bin_size)[:, None]
+    idx = np.minimum(idx.ravel(), n_samples - 1)
+    return time_axis[idx], signal_data[idx]
+
+# Figura reutilizada por todos os gráficos gerados em um mesmo processo (criada por
+# init_plot_worker ao iniciar o processo ou, fora de um pool, no primeiro gráfico).
+_figure = None
+_axes = None
+
+def get_clean_axes(figsize):
+    """
+    Retorna a figura e o eixo reutilizáveis deste processo, limpos para um novo gráfico.
+
+    Criar uma figura nova para cada gráfico (eixos, fontes, renderizador) custa mais
+    que desenhar o próprio sinal. Como os gráficos de um mesmo script têm o mesmo
+    tamanho, uma única figura por processo é criada e apenas limpa entre os gráficos.
+    A figura é criada diretamente sobre um canvas Agg, fora do gerenciador de figuras
+    do pyplot, que não tem utilidade para gráficos que são apenas salvos em arquivo.
+
+    Args:
+        figsize (tuple): O tamanho da figura em polegadas (largura, altura).
+
+    Returns:
+        tuple: Uma tupla (fig, ax) com a figura e seu único eixo.
+    """
+    global _figure, _axes
+    if _figure is None:
+        _figure = Figure(figsize=figsize)
+        FigureCanvasAgg(_figure)
+        _axes = _figure.add_subplot()
+    else:
+        _axes.clear()
+        if tuple(_figure.get_size_inches()) != tuple(figsize):
+            _figure.set_size_inches(figsize)
+    return _figure, _axes
+
+def init_plot_worker(figsize):
+    """
+    Inicializa um processo de plotagem, criando sua figura reutilizável.
+
+    Usada como 'initializer' do ProcessPoolExecutor: a figura (e o canvas Agg) é
+    criada uma única vez, quando o processo é iniciado, e depois apenas limpa por
+    get_clean_axes a cada gráfico que o processo gera.
+
+    Args:
+        figsize (tuple): O tamanho da figura em polegadas (largura, altura).
+    """
+    get_clean_axes(figsize)
+
+def save_figure(fig, save_path):
+    """
+    Salva a figura em PNG com compressão zlib rápida (nível 1).
+
+    O arquivo fica um pouco maior, mas a compressão deixa de dominar o tempo do salvamento.
+
+    Args:
+        fig (matplotlib.figure.Figure): A figura a ser salva.
+        save_path (str): O caminho do arquivo .png de saída.
+    """
+    fig.savefig(save_path, pil_kwargs={'compress_level': 1})
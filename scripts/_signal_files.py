@@ -0,0 +1,52 @@
+# -*- coding: utf-8 -*-
+"""
+Funções Auxiliares Compartilhadas para Localizar os Arquivos de Sinal.
+
+salvar_raw_para_npy.py salva cada sinal em .npy ou, com COMPRESS = True, em .npz.
+Os scripts que leem esses arquivos (passa_baixa_imu.py, plot_sinais_pre_filtrados.py)
+usam este módulo para listá-los, de modo que a regra de escolha entre os dois
+formatos seja a mesma em todos eles.
+"""
+
+import os
+
+__all__ = ["SIGNAL_EXTENSIONS", "list_signal_files"]
+
+# --- 1. Configurações ---
+
+# Extensões aceitas para os arquivos de sinal, em ordem de preferência: se um mesmo
+# registro existir nos dois formatos, é usado o da primeira extensão.
+SIGNAL_EXTENSIONS = (".npy", ".npz")
+
+# --- 2. Funções Auxiliares ---
+
+def list_signal_files(directory, suffix):
+    """
+    Lista os arquivos de sinal de um diretório, no máximo um por registro.
+
+    Um registro salvo nos dois formatos seria processado duas vezes, gerando a mesma
+    saída em processos concorrentes: fica só o arquivo da extensão preferida
+    (a primeira de SIGNAL_EXTENSIONS), e um aviso é gerado para cada arquivo ignorado.
+
+    Args:
+        directory (str): O diretório onde os arquivos estão.
+        suffix (str): O sufixo do nome antes da extensão (ex: '_ppg', '_imu').
+
+    Returns:
+        tuple: Uma tupla (arquivos, avisos) com os nomes dos arquivos em ordem
+               alfabética e as mensagens sobre os arquivos ignorados.
+    """
+    suffixes = tuple(f"{suffix}{extension}" for extension in SIGNAL_EXTENSIONS)
+    # 'os.scandir' já traz o tipo de cada entrada, sem uma chamada 'stat' extra por arquivo.
+    with os.scandir(directory) as entries:
+        found_files = sorted([e.name for e in entries if e.is_file() and e.name.endswith(suffixes)])
+
+    files_by_stem = {}
+    messages = []
+    for f in sorted(found_files, key=lambda f: SIGNAL_EXTENSIONS.index(os.path.splitext(f)[1])):
+        stem = os.path.splitext(f)[0]
+        if stem in files_by_stem:
+            messages.append(f"  ⚠️  Aviso: '{f}' ignorado, pois '{files_by_stem[stem]}' também existe.")
+        else:
+            files_by_stem[stem] = f
+    return sorted(files_by_stem.values()), messages
@@ -2,9 +2,10 @@
 """
 Script de Análise de Resultados de BPM.
 
-Este script lê todos os arquivos .csv de uma pasta de resultados,
+Este script lê todos os arquivos .csv (ou .parquet) de uma pasta de resultados,
 calcula as estatísticas de média e mediana para a coluna 'bpm' de cada arquivo,
-e imprime um resumo formatado no terminal.
+e imprime um resumo formatado no terminal, seguido das mesmas estatísticas
+agrupadas por atividade (todos os registros de cada atividade juntos).
 
 """
 
@@ -12,12 +13,72 @@ import os
 import pandas as pd
 import numpy as np
 
+# O leitor de CSV do pyarrow (multithread) é usado quando disponível;
+# sem ele, a leitura volta a ser feita pelo pandas.
+try:
+    import pyarrow as pa
+    from pyarrow import csv as pacsv
+except ImportError:
+    pacsv = None
+
 # --- 1. Configurações ---
-# Define o diretório onde os arquivos .csv de resultados estão localizados.
+# Define o diretório onde os arquivos .csv (ou .parquet) de resultados estão localizados.
 # O script espera que esta pasta esteja dentro da pasta raiz do projeto.
 INPUT_DIR = "results/"
 
-# --- 2. Execução Principal ---
+# Extensões de arquivo de resultado aceitas (ver RESULTS_FORMAT em calculate_bpm_vfinal.py).
+RESULT_EXTENSIONS = (".csv", ".parquet")
+
+# --- 2. Funções Auxiliares ---
+def activity_of(filename):
+    """
+    Extrai o tipo de atividade do nome de um arquivo de resultados.
+
+    Assume um padrão de nome como "s1_walk_...csv" e retorna o segundo elemento
+    ('Walk'). Usa str.partition, que não cria a lista completa de partes como split.
+
+    Args:
+        filename (str): O nome do arquivo.
+
+    Returns:
+        str: A atividade com a primeira letra maiúscula, ou None se o nome não seguir o padrão.
+    """
+    _, separator, rest = filename.partition('_')
+    if not separator:
+        return None
+    activity, _, _ = rest.partition('_')
+    return activity.capitalize()
+
+def read_bpm_column(file_path):
+    """
+    Lê apenas a coluna 'bpm' de um arquivo de resultados (.csv ou .parquet).
+
+    Arquivos .csv usam o leitor multithread do pyarrow quando ele está instalado,
+    e pd.read_csv caso contrário.
+
+    Args:
+        file_path (str): O caminho do arquivo de resultados.
+
+    Returns:
+        np.array: Os valores de BPM em float32 (vazio se a coluna não existir).
+    """
+    if file_path.endswith(".parquet"):
+        df = pd.read_parquet(file_path)
+    elif pacsv is not None:
+        # Só a coluna 'bpm' é convertida; se ela não existir, ela é lida como toda
+        # ausente (NaN) e o arquivo é tratado como sem dados válidos.
+        convert_options = pacsv.ConvertOptions(include_columns=['bpm'], include_missing_columns=True,
+                                               column_types={'bpm': pa.float32()})
+        table = pacsv.read_csv(file_path, convert_options=convert_options)
+        return table.column('bpm').to_numpy()
+    else:
+        # No CSV, só a coluna 'bpm' é convertida; se ela não existir, nenhuma coluna é lida.
+        df = pd.read_csv(file_path, usecols=lambda column: column == 'bpm', dtype={'bpm': 'float32'})
+    if 'bpm' not in df.columns:
+        return np.empty(0, dtype=np.float32)
+    return df['bpm'].to_numpy(dtype=np.float32)
+
+# --- 3. Execução Principal ---
 if __name__ == "__main__":
     
     # Validação do diretório de entrada para garantir que o caminho existe.
@@ -26,51 +87,67 @@ if __name__ == "__main__":
         # Fornece instruções claras se a pasta não for encontrada.
         print("\nPor favor, siga estes passos:")
         print(f"1. Crie a pasta '{INPUT_DIR}' no seu projeto.")
-        print("2. Mova os arquivos .csv gerados pelo último script de cálculo de BPM para dentro dela.")
+        print("2. Mova os arquivos .csv (ou .parquet) gerados pelo último script de cálculo de BPM para dentro dela.")
         print("3. Execute este script de análise novamente.")
         exit()
 
-    # Cria uma lista com o nome de todos os arquivos que terminam com .csv no diretório.
+    # Cria uma lista com o nome de todos os arquivos de resultado (.csv ou .parquet) no diretório.
     # A lista é ordenada para garantir uma ordem de processamento consistente.
-    csv_files = sorted([f for f in os.listdir(INPUT_DIR) if f.endswith(".csv")])
+    # 'os.scandir' já traz o tipo de cada entrada, sem uma chamada 'stat' extra por arquivo.
+    with os.scandir(INPUT_DIR) as entries:
+        csv_files = sorted([e.name for e in entries if e.is_file() and e.name.endswith(RESULT_EXTENSIONS)])
     
     # Verifica se algum arquivo foi encontrado antes de prosseguir.
     if not csv_files:
-        print(f"Nenhum arquivo .csv encontrado em '{INPUT_DIR}'.")
+        print(f"Nenhum arquivo .csv ou .parquet encontrado em '{INPUT_DIR}'.")
         exit()
 
     print(f"--- Análise dos Resultados Finais de BPM ({len(csv_files)} arquivos) ---")
 
+    # Valores de BPM de cada atividade, acumulados para o resumo por atividade.
+    bpm_by_activity = {}
+
     # Itera sobre cada nome de arquivo encontrado.
     for filename in csv_files:
         file_path = os.path.join(INPUT_DIR, filename)
         
+        # Extrai o tipo de atividade do nome do arquivo.
+        activity = activity_of(filename)
+        if activity is None:
+            # O nome do arquivo não segue o padrão esperado (ex: sem '_').
+            print(f"AVISO: Não foi possível determinar a atividade para o arquivo '{filename}'. Pulando.")
+            continue
+
         try:
-            # Extrai o tipo de atividade do nome do arquivo.
-            # Assume um padrão de nome como "s1_walk_...csv" e pega o segundo elemento ('walk').
-            activity = filename.split('_')[1].capitalize()
-            
-            # Carrega o arquivo CSV para um DataFrame do pandas.
-            df = pd.read_csv(file_path)
-
-            # Validação dos dados: verifica se o DataFrame está vazio ou se a coluna 'bpm' não tem dados válidos.
-            if df.empty or 'bpm' not in df.columns or df['bpm'].isnull().all():
+            # Lê apenas a coluna 'bpm' (em float32) como um array NumPy;
+            # se a coluna não existir, o array resultante fica vazio.
+            bpm = read_bpm_column(file_path)
+
+            # Validação dos dados: verifica se o array está vazio ou se não tem nenhum valor válido.
+            if bpm.size == 0 or np.isnan(bpm).all():
                 print(f"{activity} ({filename}): Dados insuficientes ou vazios.")
                 continue # Pula para o próximo arquivo.
 
-            # Calcula a média e a mediana da coluna 'bpm'.
-            mean_bpm = df['bpm'].mean()
-            median_bpm = df['bpm'].median()
+            # Calcula a média (acumulada em float64) e a mediana, ignorando valores ausentes.
+            mean_bpm = np.nanmean(bpm, dtype=np.float64)
+            median_bpm = np.nanmedian(bpm)
 
             # Imprime os resultados no formato solicitado.
             # "median_bpm:.2f" formata o número para ter duas casas decimais.
             print(f"{activity}: mediana->{median_bpm:.2f}, media->{mean_bpm:.2f}")
+            bpm_by_activity.setdefault(activity, []).append(bpm)
 
-        except IndexError:
-            # Captura erros caso o nome do arquivo não siga o padrão esperado (ex: sem '_').
-            print(f"AVISO: Não foi possível determinar a atividade para o arquivo '{filename}'. Pulando.")
         except Exception as e:
             # Captura qualquer outro erro que possa ocorrer durante o processamento do arquivo.
             print(f"ERRO ao processar o arquivo {filename}: {e}")
 
-    print("\n--- Análise Concluída ---")
\ No newline at end of file
+    # Resumo por atividade: junta os valores de todos os registros de cada atividade
+    # e calcula a mediana e a média sobre o conjunto.
+    if bpm_by_activity:
+        print("\n--- Resumo por Atividade ---")
+        for activity, bpm_arrays in sorted(bpm_by_activity.items()):
+            bpm = np.concatenate(bpm_arrays)
+            print(f"{activity} ({len(bpm_arrays)} arquivos): mediana->{np.nanmedian(bpm):.2f}, "
+                  f"media->{np.nanmean(bpm, dtype=np.float64):.2f}")
+
+    print("\n--- Análise Concluída ---")
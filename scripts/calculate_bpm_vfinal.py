@@ -12,9 +12,16 @@ do sinal PPG com a do sinal de movimento para descartar medições não confiáv
 """
 
 import os
+import csv
+import importlib.util
+import json
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
 import numpy as np
 import pandas as pd
-from scipy.signal import detrend
+from numpy.lib.stride_tricks import sliding_window_view
+from scipy.fft import next_fast_len, rfft, rfftfreq
+from scipy.signal import decimate
 
 # --- 1. Configurações e Parâmetros ---
 
@@ -22,12 +29,22 @@ from scipy.signal import detrend
 FILTERED_PPG_DIR = "data/dataset_physionet/filtered_1_ppg/"
 FILTERED_IMU_DIR = "data/dataset_physionet/filtered_1_imu/"
 RESULTS_DIR = "results/bpm_vfinal/"
+# Formato dos arquivos de resultado: "csv" (padrão) ou "parquet" (ver "Dependências" no README).
+RESULTS_FORMAT = "csv"
 
 # --- Parâmetros Gerais de Processamento ---
-FS = 500.0  # Frequência de amostragem dos sinais (em Hz).
+FS = 500.0  # Frequência de amostragem dos sinais do IMU (em Hz).
 WINDOW_SECONDS = 8  # Duração da janela de análise (em segundos).
 STEP_SECONDS = 1    # Passo da janela deslizante (em segundos).
-FFT_LENGTH = 4096   # Resolução da FFT (deve ser uma potência de 2, maior que o tamanho da janela).
+MIN_WINDOW_PTP = 1e-12  # Amplitude pico a pico mínima para uma janela não ser considerada constante.
+# Fator de decimação aplicado antes da FFT. As faixas de interesse vão no máximo
+# até 4 Hz, então analisar os sinais a 50 Hz (Nyquist de 25 Hz) preserva todo o
+# conteúdo útil e reduz em 10x o tamanho de cada janela e de cada FFT.
+# O PPG filtrado já é salvo nessa taxa por passa_faixa_ppg.py (TARGET_FS), que grava
+# a fs em um .json ao lado de cada .npy (conferida antes da análise); só o IMU
+# precisa ser decimado aqui.
+DECIMATION_FACTOR = 10
+FS_ANALYSIS = FS / DECIMATION_FACTOR  # Frequência de amostragem após a decimação (em Hz).
 
 # --- Parâmetros de Análise de Frequência ---
 # Define a faixa de frequência onde o algoritmo irá procurar picos.
@@ -41,123 +58,297 @@ COLLISION_THRESHOLD_HZ = 0.25  # Equivalente a ~15 BPM.
 # para que o BPM seja classificado como artefato de movimento.
 POWER_RATIO_THRESHOLD = 2.0
 
-# --- 2. Função Auxiliar ---
-def get_dominant_freq_and_power(data, fs, min_hz, max_hz):
+# --- Constantes Pré-calculadas ---
+# Todas as janelas têm o mesmo tamanho, então a janela de Hanning, o eixo de
+# frequências da FFT e os limites das faixas de busca são calculados uma única vez
+# aqui, em vez de serem reconstruídos a cada janela do loop principal.
+WINDOW_SAMPLES = int(WINDOW_SECONDS * FS_ANALYSIS)
+# Tamanho da FFT: o menor tamanho "rápido" (fatores 2, 3 e 5) que comporta a janela.
+# Para 8 s a 50 Hz isso é exatamente 400 amostras, sem o preenchimento até 512.
+FFT_LENGTH = next_fast_len(WINDOW_SAMPLES, real=True)
+# A janela é mantida em float32, a mesma precisão dos sinais carregados.
+HANN = np.hanning(WINDOW_SAMPLES).astype(np.float32)
+XF = rfftfreq(FFT_LENGTH, 1 / FS_ANALYSIS)
+# Como XF é crescente, cada faixa [min, max] vira uma fatia contínua [LO:HI] do espectro.
+BPM_LO, BPM_HI = np.searchsorted(XF, BPM_HZ_MIN, side='left'), np.searchsorted(XF, BPM_HZ_MAX, side='right')
+MOTION_LO, MOTION_HI = np.searchsorted(XF, MOTION_HZ_MIN, side='left'), np.searchsorted(XF, MOTION_HZ_MAX, side='right')
+
+# --- 2. Funções Auxiliares ---
+def compute_imu_magnitude(imu_data):
     """
-    Encontra a frequência dominante e a magnitude (potência) do pico em um sinal
-    usando a análise de FFT dentro de uma faixa de frequência específica.
+    Calcula a magnitude do movimento a partir dos 3 eixos do IMU.
 
     Args:
-        data (np.array): O vetor de dados do sinal (1D).
-        fs (float): A frequência de amostragem.
-        min_hz (float): A frequência mínima para a busca do pico.
-        max_hz (float): A frequência máxima para a busca do pico.
+        imu_data (np.array): Array com os 3 eixos na última dimensão,
+                             ex: (n_amostras, 3) ou (n_janelas, n_amostras, 3).
 
     Returns:
-        tuple: Uma tupla contendo (frequência_do_pico, potência_do_pico) ou (None, None).
+        np.array: A magnitude do movimento, com uma dimensão a menos que a entrada.
+    """
+    # O einsum soma os quadrados dos eixos sem criar o array temporário imu_data**2,
+    # e a raiz quadrada é calculada no próprio resultado.
+    magnitude = np.einsum('...j,...j->...', imu_data, imu_data)
+    np.sqrt(magnitude, out=magnitude)
+    return magnitude
+
+def demean_and_window(windows):
     """
-    if len(data) < 10: return None, None
+    Remove o nível DC (média) de cada janela e aplica a janela de Hanning.
+
+    Os sinais já chegam filtrados (o PPG passou por um passa-altas de 0.5 Hz),
+    então basta subtrair a média: a janela de Hanning cuida das descontinuidades
+    nas bordas, e um ajuste de reta por janela seria trabalho desnecessário.
+    Todas as etapas são feitas sobre uma única cópia das janelas.
+
+    Args:
+        windows (np.array): Array 2D (n_janelas, WINDOW_SAMPLES), uma janela por linha.
+
+    Returns:
+        np.array: Um novo array 2D float32 com as janelas sem nível DC e com a janela de Hanning.
+    """
+    # Cópia única: as janelas de entrada normalmente são visões do sinal original.
+    windows_final = np.array(windows, dtype=np.float32)
+    windows_final -= windows_final.mean(axis=1, keepdims=True)
+    windows_final *= HANN
+    return windows_final
+
+def get_dominant_freq_and_power(windows, lo, hi, fft_workers=1):
+    """
+    Encontra a frequência dominante e a magnitude (potência) do pico em cada
+    janela de um lote, usando uma única FFT vetorizada sobre todas as janelas
+    dentro de uma faixa de frequência específica.
+
+    Args:
+        windows (np.array): Array 2D (n_janelas, WINDOW_SAMPLES), uma janela por linha.
+        lo (int): Índice em XF do início da faixa de busca do pico.
+        hi (int): Índice em XF do fim (exclusivo) da faixa de busca do pico.
+        fft_workers (int): Número de threads usadas pela FFT.
+
+    Returns:
+        tuple: Uma tupla de arrays 1D (frequências_dos_picos, potências_dos_picos),
+               com um valor por janela. Janelas sem pico válido recebem NaN.
+    """
+    n_windows = len(windows)
+    peak_freq = np.full(n_windows, np.nan)
+    peak_power = np.full(n_windows, np.nan)
+    if n_windows == 0 or windows.shape[1] < 10:
+        return peak_freq, peak_power
+    assert windows.shape[1] == len(HANN), "As janelas devem ter WINDOW_SAMPLES amostras."
     
-    # Remove a tendência linear da janela para estabilizar a FFT.
-    data_detrended = detrend(data)
+    # Descarta janelas degeneradas antes da FFT: com NaN/infinito (a amplitude pico a
+    # pico deixa de ser finita) ou constantes (comuns no início e no fim das gravações).
+    windows_ptp = np.ptp(windows, axis=1)
+    usable = np.isfinite(windows_ptp) & (windows_ptp > MIN_WINDOW_PTP)
+    if not np.any(usable):
+        return peak_freq, peak_power
+    if not np.all(usable):
+        windows = windows[usable]
     
-    # Aplica uma janela de Hanning para reduzir o vazamento espectral.
-    hanning_win = np.hanning(len(data_detrended))
-    data_final = data_detrended * hanning_win
+    # Remove o nível DC de cada janela (linha) e aplica a janela de Hanning
+    # (pré-calculada) para reduzir o vazamento espectral.
+    windows_final = demean_and_window(windows)
     
-    # Calcula a FFT e o vetor de frequências correspondente.
-    yf = np.abs(np.fft.rfft(data_final, n=FFT_LENGTH))
-    xf = np.fft.rfftfreq(FFT_LENGTH, 1 / fs)
+    # Calcula a FFT de todas as janelas em uma única chamada. O scipy.fft guarda
+    # em cache o plano de cada tamanho/tipo, então ele é criado apenas na primeira chamada.
+    spectrum = rfft(windows_final, n=FFT_LENGTH, axis=1, workers=fft_workers)
     
-    # Cria uma máscara para buscar o pico apenas na faixa de interesse.
-    freq_mask = (xf >= min_hz) & (xf <= max_hz)
+    # O módulo só é calculado dentro da faixa de interesse, onde o pico é buscado,
+    # mais um bin de cada lado, usado pelo refinamento do pico logo abaixo.
+    band_power = np.abs(spectrum[:, lo - 1:hi + 1])
+    peak_in_band = np.argmax(band_power[:, 1:-1], axis=1) + 1
+    rows = np.arange(len(band_power))
+    p_left = band_power[rows, peak_in_band - 1]
+    p_peak = band_power[rows, peak_in_band]
+    p_right = band_power[rows, peak_in_band + 1]
     
-    # Verifica se há picos válidos na faixa e retorna a frequência e potência do mais forte.
-    if np.any(freq_mask) and np.max(yf[freq_mask]) > 0:
-        peak_idx_in_mask = np.argmax(yf[freq_mask])
-        original_indices = np.where(freq_mask)[0]
-        peak_idx_original = original_indices[peak_idx_in_mask]
-        
-        peak_freq = xf[peak_idx_original]
-        peak_power = yf[peak_idx_original]
-        return peak_freq, peak_power
-        
-    return None, None
+    # Refina a frequência do pico com interpolação parabólica sobre os 3 bins em
+    # torno do máximo, obtendo precisão melhor que a resolução da FFT (FS_ANALYSIS / FFT_LENGTH)
+    # sem precisar preencher as janelas com zeros.
+    curvature = p_left - 2 * p_peak + p_right
+    safe_curvature = np.where(curvature != 0, curvature, 1)
+    delta = np.where(curvature != 0, 0.5 * (p_left - p_right) / safe_curvature, 0.0)
+    delta = np.clip(delta, -0.5, 0.5)
+    peak_freq[usable] = XF[lo - 1 + peak_in_band] + delta * (FS_ANALYSIS / FFT_LENGTH)
+    peak_power[usable] = p_peak
+    
+    # Janelas sem energia na faixa não têm pico válido.
+    no_peak = peak_power <= 0
+    peak_freq[no_peak] = np.nan
+    peak_power[no_peak] = np.nan
+    return peak_freq, peak_power
+
+def read_ppg_fs(ppg_path):
+    """
+    Lê a frequência de amostragem do PPG filtrado, gravada por passa_faixa_ppg.py.
+
+    Args:
+        ppg_path (str): Caminho para o arquivo .npy do PPG filtrado.
+
+    Returns:
+        float: A fs do sinal (em Hz), ou None se o arquivo .json correspondente não existir.
+    """
+    try:
+        with open(os.path.splitext(ppg_path)[0] + ".json") as f:
+            return float(json.load(f)["fs"])
+    except FileNotFoundError:
+        return None
+
+def process_record(ppg_path, imu_path, fft_workers=1):
+    """
+    Executa o pipeline completo de estimativa de BPM para um único registro.
+
+    Cada registro é independente dos demais, então esta função é executada em
+    paralelo (um registro por processo) a partir da execução principal.
+
+    Args:
+        ppg_path (str): Caminho para o arquivo .npy do PPG filtrado.
+        imu_path (str): Caminho para o arquivo .npy do IMU filtrado (pode não existir).
+        fft_workers (int): Número de threads usadas por cada FFT deste registro.
+
+    Returns:
+        tuple: Uma tupla de arrays 1D (tempo_s, bpm) com as janelas validadas (vazios se nenhuma).
+    """
+    # Carrega os dados, verificando se o arquivo IMU existe.
+    # Os arquivos são mapeados em memória (mmap) em vez de lidos por inteiro, e a
+    # conversão para float32 é a única passada pelo disco: se o arquivo já estiver
+    # em float32, nenhuma cópia é feita e as janelas são lidas sob demanda.
+    # A precisão de float32 é mais que suficiente para localizar o pico da FFT.
+    has_imu = os.path.exists(imu_path)
+    ppg_filtered = np.ascontiguousarray(np.load(ppg_path, mmap_mode='r'), dtype=np.float32)
+    if has_imu:
+        imu_filtered = np.ascontiguousarray(np.load(imu_path, mmap_mode='r'), dtype=np.float32)
+
+    window_samples = WINDOW_SAMPLES
+    step_samples = int(STEP_SECONDS * FS_ANALYSIS)
+
+    # Monta todas as janelas deslizantes de 8 segundos como visões (sem cópia) do sinal.
+    window_starts = np.arange(0, len(ppg_filtered) - window_samples, step_samples)
+    n_windows = len(window_starts)
+    if n_windows == 0:
+        return np.empty(0), np.empty(0)
+    ppg_windows = sliding_window_view(ppg_filtered, window_samples)[::step_samples][:n_windows]
+    
+    # Etapa 1: Encontra o BPM candidato e sua potência no sinal PPG, para todas as janelas.
+    ppg_freqs, ppg_powers = get_dominant_freq_and_power(ppg_windows, BPM_LO, BPM_HI, fft_workers)
+    
+    # Etapa 2: Validação com IMU (se disponível).
+    # Janelas sem IMU completo ficam com NaN e não passam pela validação.
+    motion_freqs = np.full(n_windows, np.nan)
+    motion_powers = np.full(n_windows, np.nan)
+    if has_imu and len(imu_filtered) >= window_samples * DECIMATION_FACTOR:
+        # Calcula a magnitude do movimento a partir dos 3 eixos uma única vez para o
+        # registro inteiro; cada janela passa a ser apenas uma visão desse sinal 1D,
+        # em vez de recalcular a magnitude das amostras sobrepostas em cada janela.
+        # A magnitude (não linear) é calculada na taxa original e só então decimada
+        # para FS_ANALYSIS, com filtro anti-aliasing FIR de fase zero, a mesma taxa
+        # em que o PPG filtrado foi salvo.
+        imu_magnitude = decimate(compute_imu_magnitude(imu_filtered), DECIMATION_FACTOR,
+                                 ftype='fir', zero_phase=True)
+        imu_windows = sliding_window_view(imu_magnitude, window_samples)[::step_samples][:n_windows]
+        n_imu = len(imu_windows)
+        # Encontra a frequência e potência do movimento.
+        motion_freqs[:n_imu], motion_powers[:n_imu] = get_dominant_freq_and_power(
+            imu_windows, MOTION_LO, MOTION_HI, fft_workers)
+
+    # Aplica a lógica do "Detector de Mentiras" em todas as janelas de uma vez.
+    # Comparações com NaN resultam em False, então janelas sem movimento detectado
+    # nunca são marcadas como artefato.
+    # Colisão com a frequência fundamental do movimento ou com seu primeiro harmônico (2x a frequência).
+    collides = ((np.abs(ppg_freqs - motion_freqs) < COLLISION_THRESHOLD_HZ) |
+                (np.abs(ppg_freqs - 2 * motion_freqs) < COLLISION_THRESHOLD_HZ))
+    # Se colidiram, aplica o desempate pela potência.
+    is_artifact = collides & (motion_powers * POWER_RATIO_THRESHOLD > ppg_powers)
+    
+    # Etapa 3: Mantém apenas as janelas com pico válido que não foram classificadas como artefato.
+    is_valid = ~np.isnan(ppg_freqs) & ~is_artifact
+    return window_starts[is_valid] / FS_ANALYSIS, ppg_freqs[is_valid] * 60
+
+def save_bpm_csv(csv_path, tempo_s, bpm):
+    """
+    Salva a série temporal de BPM em um arquivo .csv com duas casas decimais.
+
+    As linhas são escritas diretamente com csv.writer, sem montar um DataFrame
+    intermediário apenas para a serialização.
+
+    Args:
+        csv_path (str): O caminho do arquivo .csv de saída.
+        tempo_s (np.array): O início de cada janela (em segundos).
+        bpm (np.array): O BPM estimado em cada janela.
+    """
+    with open(csv_path, 'w', newline='') as f:
+        writer = csv.writer(f, lineterminator='\n')
+        writer.writerow(['tempo_s', 'bpm'])
+        writer.writerows((f"{t:.2f}", f"{b:.2f}") for t, b in zip(tempo_s.tolist(), bpm.tolist()))
+
+def save_bpm_parquet(parquet_path, tempo_s, bpm):
+    """
+    Salva a série temporal de BPM em um arquivo .parquet, com colunas float32.
+
+    Args:
+        parquet_path (str): O caminho do arquivo .parquet de saída.
+        tempo_s (np.array): O início de cada janela (em segundos).
+        bpm (np.array): O BPM estimado em cada janela.
+    """
+    results_df = pd.DataFrame({
+        'tempo_s': tempo_s.astype(np.float32),
+        'bpm': bpm.astype(np.float32)
+    })
+    results_df.to_parquet(parquet_path, index=False)
 
 # --- 3. Execução Principal ---
 if __name__ == "__main__":
+    if RESULTS_FORMAT == "parquet" and importlib.util.find_spec("pyarrow") is None:
+        print('🚨 ERRO: RESULTS_FORMAT = "parquet" requer o pacote pyarrow (pip install pyarrow).')
+        exit()
+
     os.makedirs(RESULTS_DIR, exist_ok=True)
-    print(f"Diretório para resultados CSV: {os.path.abspath(RESULTS_DIR)}")
+    print(f"Diretório para resultados {RESULTS_FORMAT.upper()}: {os.path.abspath(RESULTS_DIR)}")
     
-    # Encontra todos os arquivos de PPG já filtrados.
-    ppg_files = sorted([f for f in os.listdir(FILTERED_PPG_DIR) if f.endswith("_filtered_c5.npy")])
-    print(f"\nIniciando processamento final de {len(ppg_files)} registros com desempate por potência...")
-
-    # Itera sobre cada registro para processamento individual.
-    for ppg_filename in ppg_files:
-        base_name = ppg_filename.replace('_filtered_c5.npy', '')
-        print(f"\n--- Processando registro: {base_name} ---")
-
-        # Constrói os caminhos para os arquivos PPG e IMU.
-        ppg_path = os.path.join(FILTERED_PPG_DIR, ppg_filename)
-        imu_filename = f"{base_name}_imu.npy"
-        imu_path = os.path.join(FILTERED_IMU_DIR, imu_filename)
-
-        # Carrega os dados, verificando se o arquivo IMU existe.
-        has_imu = os.path.exists(imu_path)
-        ppg_filtered = np.load(ppg_path)
-        if has_imu:
-            imu_filtered = np.load(imu_path)
-
-        window_samples = int(WINDOW_SECONDS * FS)
-        step_samples = int(STEP_SECONDS * FS)
-        final_results = []
-
-        # Loop da janela deslizante: analisa o sinal em trechos de 8 segundos.
-        for i in range(0, len(ppg_filtered) - window_samples, step_samples):
-            window_start_s = i / FS
-            ppg_window = ppg_filtered[i : i + window_samples]
-            
-            # Etapa 1: Encontra o BPM candidato e sua potência no sinal PPG.
-            ppg_freq, ppg_power = get_dominant_freq_and_power(ppg_window, FS, BPM_HZ_MIN, BPM_HZ_MAX)
-            if ppg_freq is None: continue
-            
-            bpm_candidate = ppg_freq * 60
-            
-            # Etapa 2: Validação com IMU (se disponível).
-            is_artifact = False
-            if has_imu:
-                imu_window = imu_filtered[i : i + window_samples]
-                # Calcula a magnitude do movimento a partir dos 3 eixos.
-                imu_magnitude = np.sqrt(np.sum(imu_window**2, axis=1))
-                # Encontra a frequência e potência do movimento.
-                motion_freq, motion_power = get_dominant_freq_and_power(imu_magnitude, FS, MOTION_HZ_MIN, MOTION_HZ_MAX)
+    # Encontra todos os arquivos de PPG já filtrados ('os.scandir' já traz o tipo de
+    # cada entrada, sem uma chamada 'stat' extra por arquivo).
+    with os.scandir(FILTERED_PPG_DIR) as entries:
+        ppg_files = sorted([e.name for e in entries if e.is_file() and e.name.endswith("_filtered_c5.npy")])
+
+    # Mantém apenas os registros cujo PPG foi salvo na taxa usada pela análise (FS_ANALYSIS).
+    ppg_paths = []
+    for f in ppg_files:
+        ppg_path = os.path.join(FILTERED_PPG_DIR, f)
+        ppg_fs = read_ppg_fs(ppg_path)
+        if ppg_fs is None:
+            print(f"  🚨 ERRO: fs de '{f}' desconhecida (arquivo .json ausente). Execute passa_faixa_ppg.py novamente.")
+        elif ppg_fs != FS_ANALYSIS:
+            print(f"  🚨 ERRO: '{f}' está a {ppg_fs} Hz, mas a análise espera {FS_ANALYSIS} Hz. Registro ignorado.")
+        else:
+            ppg_paths.append(ppg_path)
+    print(f"\nIniciando processamento final de {len(ppg_paths)} registros com desempate por potência...")
+
+    # Constrói os caminhos para os arquivos IMU de cada registro.
+    base_names = [os.path.basename(p).replace('_filtered_c5.npy', '') for p in ppg_paths]
+    imu_paths = [os.path.join(FILTERED_IMU_DIR, f"{name}_imu.npy") for name in base_names]
+
+    # Os registros são independentes: cada um é processado em um processo separado,
+    # e os resultados são salvos aqui, na ordem original, conforme ficam prontos.
+    # Os núcleos são divididos entre processos e threads da FFT: com menos registros
+    # que núcleos, cada FFT usa várias threads; caso contrário, uma por processo,
+    # para não haver mais threads disputando a CPU do que núcleos disponíveis.
+    n_cpus = os.cpu_count() or 1
+    n_processes = max(1, min(n_cpus, len(ppg_paths)))
+    fft_workers = max(1, n_cpus // n_processes)
+    with ProcessPoolExecutor(max_workers=n_processes) as executor:
+        results = executor.map(process_record, ppg_paths, imu_paths, repeat(fft_workers))
+        for base_name, (tempo_s, bpm) in zip(base_names, results):
+            print(f"\n--- Registro processado: {base_name} ---")
+
+            # Salva os resultados válidos do registro no formato configurado.
+            if len(bpm) == 0:
+                print(f"  ℹ️  Nenhuma janela com BPM validado foi encontrada para {base_name}.")
+                continue
                 
-                # Aplica a lógica do "Detector de Mentiras" se o movimento foi detectado.
-                if motion_freq and motion_power:
-                    # Verifica colisão com a frequência fundamental do movimento.
-                    if abs(ppg_freq - motion_freq) < COLLISION_THRESHOLD_HZ:
-                        # Se colidiram, aplica o desempate pela potência.
-                        if motion_power * POWER_RATIO_THRESHOLD > ppg_power:
-                            is_artifact = True
-                    
-                    # Verifica colisão com o primeiro harmônico do movimento (2x a frequência).
-                    if abs(ppg_freq - 2 * motion_freq) < COLLISION_THRESHOLD_HZ:
-                        if motion_power * POWER_RATIO_THRESHOLD > ppg_power:
-                            is_artifact = True
-            
-            # Etapa 3: Salva o resultado apenas se não for classificado como um artefato.
-            if not is_artifact:
-                final_results.append({'tempo_s': window_start_s, 'bpm': bpm_candidate})
-
-        # Ao final do processamento do arquivo, salva os resultados válidos em um CSV.
-        if not final_results:
-            print(f"  ℹ️  Nenhuma janela com BPM validado foi encontrada para {base_name}.")
-            continue
-            
-        results_df = pd.DataFrame(final_results)
-        csv_path = os.path.join(RESULTS_DIR, f"{base_name}_bpm_results_final_v_power.csv")
-        results_df.to_csv(csv_path, index=False, float_format='%.2f')
-        print(f"  ✅ Resultados de BPM (com desempate por potência) salvos em: {csv_path}")
-
-    print("\n--- Processamento Final Concluído ---")
\ No newline at end of file
+            results_path = os.path.join(RESULTS_DIR, f"{base_name}_bpm_results_final_v_power.{RESULTS_FORMAT}")
+            if RESULTS_FORMAT == "parquet":
+                save_bpm_parquet(results_path, tempo_s, bpm)
+            else:
+                save_bpm_csv(results_path, tempo_s, bpm)
+            print(f"  ✅ Resultados de BPM (com desempate por potência) salvos em: {results_path}")
+
+    print("\n--- Processamento Final Concluído ---")
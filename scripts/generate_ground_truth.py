@@ -13,10 +13,14 @@ desempenho do nosso algoritmo de estimativa de BPM a partir do PPG.
 """
 
 import os
+import csv
+import importlib.util
+from concurrent.futures import ProcessPoolExecutor
 import wfdb
 import numpy as np
 import pandas as pd
-from biosppy.signals import ecg
+from biosppy.signals import tools
+from biosppy.signals.ecg import hamilton_segmenter, correct_rpeaks
 
 # --- 1. Configurações e Parâmetros ---
 
@@ -24,92 +28,194 @@ from biosppy.signals import ecg
 RAW_DATA_DIR = "data/dataset_physionet/raw/"
 # Diretório onde os arquivos .csv com o BPM do ECG (ground truth) serão salvos.
 GROUND_TRUTH_DIR = "results/ground_truth/"
+# Formato dos arquivos de ground truth: "csv" (padrão) ou "parquet" (ver "Dependências" no README).
+RESULTS_FORMAT = "csv"
+
+# --- Parâmetros da Detecção de Picos R ---
+# Os mesmos valores usados internamente por biosppy.signals.ecg.ecg.
+ECG_FILTER_BAND = [0.67, 45.0]  # Faixa do filtro FIR passa-faixa (em Hz).
+RPEAK_CORRECTION_TOL = 0.05  # Tolerância para o ajuste fino dos picos R (em segundos).
+# Um pico só é mantido se houver um batimento completo em torno dele.
+BEAT_BEFORE_S, BEAT_AFTER_S = 0.2, 0.4
+
+def save_ecg_bpm_csv(csv_path, tempo_s, bpm_ecg):
+    """
+    Salva a série temporal de BPM do ECG em um arquivo .csv com duas casas decimais.
+
+    As linhas são escritas diretamente com csv.writer, sem montar um DataFrame
+    intermediário apenas para a serialização.
+
+    Args:
+        csv_path (str): O caminho do arquivo .csv de saída.
+        tempo_s (np.array): O instante de cada batimento (em segundos).
+        bpm_ecg (np.array): O BPM instantâneo em cada batimento.
+    """
+    with open(csv_path, 'w', newline='') as f:
+        writer = csv.writer(f, lineterminator='\n')
+        writer.writerow(['tempo_s', 'bpm_ecg'])
+        writer.writerows((f"{t:.2f}", f"{b:.2f}") for t, b in zip(tempo_s.tolist(), bpm_ecg.tolist()))
+
+def save_ecg_bpm_parquet(parquet_path, tempo_s, bpm_ecg):
+    """
+    Salva a série temporal de BPM do ECG em um arquivo .parquet, com colunas float32.
+
+    Args:
+        parquet_path (str): O caminho do arquivo .parquet de saída.
+        tempo_s (np.array): O instante de cada batimento (em segundos).
+        bpm_ecg (np.array): O BPM instantâneo em cada batimento.
+    """
+    results_df = pd.DataFrame({
+        'tempo_s': tempo_s.astype(np.float32),
+        'bpm_ecg': bpm_ecg.astype(np.float32)
+    })
+    results_df.to_parquet(parquet_path, index=False)
+
+def detect_r_peaks(ecg_signal, fs):
+    """
+    Detecta os picos R de um sinal de ECG com o segmentador de Hamilton do BioSPPy.
+
+    Reproduz as etapas de ecg.ecg que determinam os picos (filtragem, segmentação,
+    correção e descarte dos batimentos incompletos nas bordas), sem extrair os
+    templates dos batimentos nem calcular a frequência cardíaca suavizada, que
+    não são usados aqui.
+
+    Args:
+        ecg_signal (np.array): O sinal de ECG (normalizado).
+        fs (float): A frequência de amostragem do sinal.
+
+    Returns:
+        np.array: Os índices dos picos R detectados, em ordem crescente.
+    """
+    fs = float(fs)
+    # Filtro FIR passa-faixa e remoção do nível DC, como em ecg.ecg.
+    filtered, _, _ = tools.filter_signal(signal=ecg_signal, ftype='FIR', band='bandpass',
+                                         order=int(1.5 * fs), frequency=ECG_FILTER_BAND,
+                                         sampling_rate=fs)
+    filtered = filtered - np.mean(filtered)
+
+    # Segmentação (Hamilton) e ajuste fino da posição de cada pico.
+    r_peaks, = hamilton_segmenter(signal=filtered, sampling_rate=fs)
+    r_peaks, = correct_rpeaks(signal=filtered, rpeaks=r_peaks, sampling_rate=fs, tol=RPEAK_CORRECTION_TOL)
+
+    # Descarta os picos sem um batimento completo em torno deles (início/fim do registro).
+    r_peaks = np.sort(r_peaks)
+    has_full_beat = ((r_peaks - int(BEAT_BEFORE_S * fs) >= 0) &
+                     (r_peaks + int(BEAT_AFTER_S * fs) <= len(filtered)))
+    return r_peaks[has_full_beat]
+
+def compute_ecg_bpm(rec_name):
+    """
+    Detecta os picos R do ECG de um registro e calcula seu BPM instantâneo.
+
+    Cada registro é independente dos demais, então esta função é executada em
+    paralelo (um registro por processo) a partir da execução principal.
+
+    Args:
+        rec_name (str): O nome base do registro (ex: 's1_run').
+
+    Returns:
+        tuple: Uma tupla (tempo_s, bpm_ecg, aviso). Em caso de sucesso, 'aviso' é None;
+               caso contrário, os arrays são None e 'aviso' explica por que o registro foi pulado.
+    """
+    try:
+        # Lê apenas o cabeçalho do registro (metadados) para localizar o canal de ECG.
+        record_path = os.path.join(RAW_DATA_DIR, rec_name)
+        header = wfdb.rdheader(record_path)
+        
+        # Procura pelo canal de ECG nos nomes de sinais do registro.
+        ecg_channel_idx = -1
+        for i, sig_name in enumerate(header.sig_name):
+            if 'ECG' in sig_name.upper():
+                ecg_channel_idx = i
+                break
+        
+        # Se nenhum canal de ECG for encontrado, pula o registro.
+        if ecg_channel_idx == -1:
+            return None, None, f"  ℹ️  Canal ECG não encontrado para {rec_name}. Pulando."
+
+        # Carrega somente o canal de ECG do arquivo de sinais, em vez de todos os canais.
+        record = wfdb.rdrecord(record_path, channels=[ecg_channel_idx])
+
+        # Extrai o sinal de ECG bruto e a frequência de amostragem do arquivo.
+        ecg_signal_raw = record.p_signal[:, 0]
+        fs = record.fs
+
+        # --- ETAPA DE NORMALIZAÇÃO DO SINAL ---
+        # Padroniza o sinal para ter média 0 e desvio padrão 1.
+        # Isso torna a detecção de picos mais robusta, pois independe da amplitude
+        # ou do offset DC original do sinal.
+        if np.std(ecg_signal_raw) > 0:
+            ecg_signal_normalized = (ecg_signal_raw - np.mean(ecg_signal_raw)) / np.std(ecg_signal_raw)
+        else:
+            ecg_signal_normalized = ecg_signal_raw # Evita divisão por zero.
+        
+        # --- DETECÇÃO DE PICOS R COM BIOSPPY ---
+        # Executa apenas as etapas do BioSPPy necessárias para obter os índices dos picos R.
+        r_peaks_indices = detect_r_peaks(ecg_signal_normalized, fs)
+        
+        # Validação: exige um número mínimo de picos para gerar um resultado confiável.
+        if len(r_peaks_indices) < 5:
+            return None, None, f"  ℹ️  Número insuficiente de picos R detectados por BioSPPy em {rec_name}. Pulando."
+        
+        # --- CÁLCULO DO BPM ---
+        # Calcula a diferença entre picos R consecutivos para obter os intervalos R-R.
+        rr_intervals_s = np.diff(r_peaks_indices) / fs
+        
+        # Converte os intervalos de tempo para batimentos por minuto.
+        ecg_bpms = 60.0 / rr_intervals_s
+        
+        # Cria um vetor de tempo para cada valor de BPM calculado.
+        ecg_bpm_times_s = r_peaks_indices[1:] / fs
+        return ecg_bpm_times_s, ecg_bpms, None
+
+    except Exception as e:
+        return None, None, f"  ❌ ERRO ao processar o registro {rec_name}: {e}"
 
 # --- 2. Execução Principal ---
 if __name__ == "__main__":
+    if RESULTS_FORMAT == "parquet" and importlib.util.find_spec("pyarrow") is None:
+        print('🚨 ERRO: RESULTS_FORMAT = "parquet" requer o pacote pyarrow (pip install pyarrow).')
+        exit()
+
     # Garante que o diretório de saída exista; se não, ele será criado.
     os.makedirs(GROUND_TRUTH_DIR, exist_ok=True)
-    print(f"Diretório de saída para o Ground Truth: {os.path.abspath(GROUND_TRUTH_DIR)}")
+    print(f"Diretório de saída para o Ground Truth ({RESULTS_FORMAT.upper()}): {os.path.abspath(GROUND_TRUTH_DIR)}")
 
     # Encontra todos os registros no diretório raw, baseando-se nos arquivos de cabeçalho (.hea).
-    record_names = sorted([os.path.splitext(f)[0] for f in os.listdir(RAW_DATA_DIR) if f.endswith(".hea")])
+    # 'os.scandir' já traz o tipo de cada entrada, sem uma chamada 'stat' extra por arquivo.
+    with os.scandir(RAW_DATA_DIR) as entries:
+        record_names = sorted([os.path.splitext(e.name)[0] for e in entries
+                               if e.is_file() and e.name.endswith(".hea")])
     if not record_names:
         print(f"🚨 ERRO: Nenhum registro encontrado em '{RAW_DATA_DIR}'")
         exit()
 
     print(f"\nIniciando geração de Ground Truth para {len(record_names)} registros usando BioSPPy...")
 
-    # Itera sobre cada registro encontrado para processamento individual.
-    for rec_name in record_names:
-        print(f"\n--- Processando registro: {rec_name} ---")
-        
-        try:
-            # Carrega o registro completo (sinais e metadados) usando a biblioteca WFDB.
-            record = wfdb.rdrecord(os.path.join(RAW_DATA_DIR, rec_name))
-            
-            # Procura pelo canal de ECG nos nomes de sinais do registro.
-            ecg_channel_idx = -1
-            for i, sig_name in enumerate(record.sig_name):
-                if 'ECG' in sig_name.upper():
-                    ecg_channel_idx = i
-                    break
-            
-            # Se nenhum canal de ECG for encontrado, pula para o próximo registro.
-            if ecg_channel_idx == -1:
-                print(f"  ℹ️  Canal ECG não encontrado para {rec_name}. Pulando.")
-                continue
-
-            # Extrai o sinal de ECG bruto e a frequência de amostragem do arquivo.
-            ecg_signal_raw = record.p_signal[:, ecg_channel_idx]
-            fs = record.fs
-
-            # --- ETAPA DE NORMALIZAÇÃO DO SINAL ---
-            # Padroniza o sinal para ter média 0 e desvio padrão 1.
-            # Isso torna a detecção de picos mais robusta, pois independe da amplitude
-            # ou do offset DC original do sinal.
-            if np.std(ecg_signal_raw) > 0:
-                ecg_signal_normalized = (ecg_signal_raw - np.mean(ecg_signal_raw)) / np.std(ecg_signal_raw)
-            else:
-                ecg_signal_normalized = ecg_signal_raw # Evita divisão por zero.
-            
-            # --- DETECÇÃO DE PICOS R COM BIOSPPY ---
-            # Chama a função principal da biblioteca, que executa um algoritmo otimizado.
-            # O parâmetro 'show=False' impede que a função tente gerar um gráfico.
-            ecg_results = ecg.ecg(signal=ecg_signal_normalized, sampling_rate=fs, show=False)
-            
-            # Extrai os índices dos picos R detectados do dicionário de resultados.
-            r_peaks_indices = ecg_results['rpeaks']
+    # Os registros são independentes: a detecção de picos de cada um roda em um
+    # processo separado, e os resultados são salvos aqui, na ordem original.
+    n_processes = max(1, min(os.cpu_count() or 1, len(record_names)))
+    with ProcessPoolExecutor(max_workers=n_processes) as executor:
+        results = executor.map(compute_ecg_bpm, record_names)
+        for rec_name, (ecg_bpm_times_s, ecg_bpms, warning) in zip(record_names, results):
+            print(f"\n--- Processando registro: {rec_name} ---")
             
-            # Validação: exige um número mínimo de picos para gerar um resultado confiável.
-            if len(r_peaks_indices) < 5:
-                print(f"  ℹ️  Número insuficiente de picos R detectados por BioSPPy em {rec_name}. Pulando.")
+            if warning is not None:
+                print(warning)
                 continue
             
-            print(f"  Encontrados {len(r_peaks_indices)} picos R.")
-            
-            # --- CÁLCULO DO BPM ---
-            # Calcula a diferença entre picos R consecutivos para obter os intervalos R-R.
-            rr_intervals_s = np.diff(r_peaks_indices) / fs
-            
-            # Converte os intervalos de tempo para batimentos por minuto.
-            ecg_bpms = 60.0 / rr_intervals_s
-            
-            # Cria um vetor de tempo para cada valor de BPM calculado.
-            ecg_bpm_times_s = r_peaks_indices[1:] / fs
+            print(f"  Encontrados {len(ecg_bpms) + 1} picos R.")
             
             # --- SALVAMENTO DOS RESULTADOS ---
-            # Organiza os resultados em um DataFrame do pandas.
-            results_df = pd.DataFrame({
-                'tempo_s': ecg_bpm_times_s,
-                'bpm_ecg': ecg_bpms
-            })
-            
-            # Salva o DataFrame em um arquivo .csv.
-            csv_path = os.path.join(GROUND_TRUTH_DIR, f"{rec_name}_ecg_bpm.csv")
-            results_df.to_csv(csv_path, index=False, float_format='%.2f')
-            print(f"  ✅ Ground Truth de BPM salvo em: {csv_path}")
-
-        except Exception as e:
-            print(f"  ❌ ERRO ao processar o registro {rec_name}: {e}")
+            # Salva a série temporal de BPM no formato configurado.
+            results_path = os.path.join(GROUND_TRUTH_DIR, f"{rec_name}_ecg_bpm.{RESULTS_FORMAT}")
+            try:
+                if RESULTS_FORMAT == "parquet":
+                    save_ecg_bpm_parquet(results_path, ecg_bpm_times_s, ecg_bpms)
+                else:
+                    save_ecg_bpm_csv(results_path, ecg_bpm_times_s, ecg_bpms)
+                print(f"  ✅ Ground Truth de BPM salvo em: {results_path}")
+            except Exception as e:
+                print(f"  ❌ ERRO ao processar o registro {rec_name}: {e}")
 
     print("\n--- Geração de Ground Truth Concluída ---")
\ No newline at end of file
@@ -8,13 +8,18 @@ filtro passa-baixa suave para remover ruído de alta frequência do sensor
 """
 
 import os
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
 import numpy as np
-from scipy.signal import butter, filtfilt
+from scipy.signal import butter, sosfiltfilt
+from _signal_files import list_signal_files
 
 # --- 1. Configurações ---
 
 # Diretório onde os dados brutos do IMU (.npy) estão localizados.
 INPUT_IMU_DIR = "data/dataset_physionet/pre_filtered_imu/"
+# Os arquivos de entrada podem ser .npy ou .npz (quando salvar_raw_para_npy.py é
+# executado com COMPRESS = True). A saída é sempre salva em .npy.
 # Diretório onde os dados do IMU já filtrados (suavizados) serão salvos.
 PROCESSED_IMU_DIR = "data/dataset_physionet/filtered_1_imu/"
 
@@ -28,6 +33,26 @@ LOWPASS_CUTOFF = 20.0
 # Ordem do filtro: define quão "íngreme" é a atenuação após a frequência de corte.
 FILTER_ORDER = 4
 
+@lru_cache(maxsize=8)
+def design_imu_filter(fs):
+    """
+    Projeta o filtro passa-baixa Butterworth do IMU em seções de segunda ordem (SOS).
+
+    O resultado é memorizado por fs, então o filtro é projetado uma única vez por
+    frequência de amostragem em vez de a cada arquivo processado.
+
+    Args:
+        fs (float): A frequência de amostragem do sinal.
+
+    Returns:
+        np.array: Os coeficientes do filtro no formato SOS.
+    """
+    # Normaliza a frequência de corte pela frequência de Nyquist.
+    # As seções de segunda ordem são numericamente mais estáveis que os coeficientes (b, a).
+    nyquist_freq = 0.5 * fs
+    low_cutoff_norm = LOWPASS_CUTOFF / nyquist_freq
+    return butter(FILTER_ORDER, low_cutoff_norm, btype='lowpass', analog=False, output='sos')
+
 def filter_imu_data(raw_imu_data, fs):
     """
     Aplica um filtro passa-baixa Butterworth de fase zero em cada eixo dos dados do IMU.
@@ -39,19 +64,45 @@ def filter_imu_data(raw_imu_data, fs):
     Returns:
         np.array: O array 2D com os dados do IMU filtrados.
     """
-    # Projeta o filtro passa-baixa Butterworth, obtendo seus coeficientes (b, a).
-    # Normaliza a frequência de corte pela frequência de Nyquist.
-    nyquist_freq = 0.5 * fs
-    low_cutoff_norm = LOWPASS_CUTOFF / nyquist_freq
-    b, a = butter(FILTER_ORDER, low_cutoff_norm, btype='lowpass', analog=False)
+    # Obtém o filtro para esta fs (projetado uma única vez por fs).
+    sos = design_imu_filter(fs)
     
-    # Aplica o filtro aos dados. 'filtfilt' é usado para evitar atraso de fase no sinal.
+    # Aplica o filtro aos dados. 'sosfiltfilt' é usado para evitar atraso de fase no sinal.
     # O parâmetro 'axis=0' é crucial: ele garante que o filtro seja aplicado
     # verticalmente, ao longo do tempo, para cada eixo (coluna) de forma independente.
-    filtered_imu_data = filtfilt(b, a, raw_imu_data, axis=0)
+    filtered_imu_data = sosfiltfilt(sos, raw_imu_data, axis=0)
     
     return filtered_imu_data
 
+def filter_imu_file(input_path, output_path):
+    """
+    Carrega um arquivo de IMU bruto, aplica o filtro passa-baixa e salva o resultado.
+
+    Cada arquivo é independente dos demais, então esta função é executada em
+    paralelo (um arquivo por processo) a partir da execução principal. O sinal
+    filtrado é salvo pelo próprio processo, evitando transferir o array de volta.
+
+    Args:
+        input_path (str): O caminho do arquivo .npy (ou .npz) com os dados brutos do IMU.
+        output_path (str): O caminho do arquivo .npy de saída.
+    """
+    # Carrega os dados brutos do IMU (um array com 3 colunas/eixos).
+    # Um arquivo .npy é mapeado em memória (mmap) em vez de lido por inteiro: o filtro
+    # só lê o sinal e grava o resultado em um array novo, então as páginas são
+    # carregadas sob demanda pelo sistema operacional. Um .npz comprimido é
+    # descomprimido por inteiro.
+    if input_path.endswith(".npz"):
+        with np.load(input_path) as archive:
+            raw_imu = archive['imu']
+    else:
+        raw_imu = np.load(input_path, mmap_mode='r')
+    
+    # Chama a função para aplicar o filtro passa-baixa.
+    filtered_imu = filter_imu_data(raw_imu, FS)
+    
+    # Salva o novo array com os dados filtrados no diretório de saída.
+    np.save(output_path, filtered_imu)
+
 # --- 2. Execução Principal ---
 if __name__ == "__main__":
     # Garante que o diretório de saída exista.
@@ -64,29 +115,27 @@ if __name__ == "__main__":
         exit()
 
     # Encontra todos os arquivos de IMU no diretório de entrada.
-    imu_files = sorted([f for f in os.listdir(INPUT_IMU_DIR) if f.endswith("_imu.npy")])
+    # Se um registro existir nos dois formatos, só um deles é filtrado (ver _signal_files.py).
+    imu_files, ignored_messages = list_signal_files(INPUT_IMU_DIR, "_imu")
+    for message in ignored_messages:
+        print(message)
     
     if not imu_files:
-        print(f"Nenhum arquivo _imu.npy encontrado em {os.path.abspath(INPUT_IMU_DIR)}")
+        print(f"Nenhum arquivo _imu.npy (ou _imu.npz) encontrado em {os.path.abspath(INPUT_IMU_DIR)}")
         exit()
 
     print(f"\nEncontrados {len(imu_files)} arquivos IMU para filtrar.")
 
-    # Itera sobre cada arquivo de IMU encontrado.
-    for filename in imu_files:
-        print(f"\nProcessando arquivo: {filename}...")
-        
-        input_path = os.path.join(INPUT_IMU_DIR, filename)
-        
-        # Carrega os dados brutos do IMU (um array com 3 colunas/eixos).
-        raw_imu = np.load(input_path)
-        
-        # Chama a função para aplicar o filtro passa-baixa.
-        filtered_imu = filter_imu_data(raw_imu, FS)
-        
-        # Salva o novo array com os dados filtrados no diretório de saída.
-        output_path = os.path.join(PROCESSED_IMU_DIR, filename)
-        np.save(output_path, filtered_imu)
-        print(f"  ✅ Sinal IMU filtrado salvo em: {output_path}")
+    input_paths = [os.path.join(INPUT_IMU_DIR, f) for f in imu_files]
+    output_paths = [os.path.join(PROCESSED_IMU_DIR, os.path.splitext(f)[0] + ".npy") for f in imu_files]
+
+    # Os arquivos são independentes: cada um é filtrado e salvo em um processo separado.
+    # As mensagens são impressas aqui, na ordem original, conforme os arquivos ficam prontos.
+    n_processes = max(1, min(os.cpu_count() or 1, len(imu_files)))
+    with ProcessPoolExecutor(max_workers=n_processes) as executor:
+        results = executor.map(filter_imu_file, input_paths, output_paths)
+        for filename, output_path, _ in zip(imu_files, output_paths, results):
+            print(f"\nProcessando arquivo: {filename}...")
+            print(f"  ✅ Sinal IMU filtrado salvo em: {output_path}")
 
     print("\n--- Filtragem do IMU Concluída ---")
\ No newline at end of file
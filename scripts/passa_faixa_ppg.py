@@ -9,9 +9,14 @@ arquivo .npy para as próximas etapas de análise.
 """
 
 import os
+import importlib.util
+import json
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache, partial
 import wfdb
 import numpy as np
-from scipy.signal import butter, filtfilt
+import pandas as pd
+from scipy.signal import butter, decimate, sosfiltfilt
 
 # --- 1. Configurações ---
 
@@ -20,10 +25,19 @@ from scipy.signal import butter, filtfilt
 RAW_DATA_DIR = "data/dataset_physionet/raw/"
 # Diretório onde os dados de PPG já filtrados serão salvos.
 FILTERED_DATA_DIR = "data/dataset_physionet/filtered_1_ppg/"
+# Se True, além dos arquivos .npy por registro (usados pelas próximas etapas do
+# pipeline), todos os sinais filtrados também são exportados em uma única tabela
+# Parquet, para análises em lote (ver "Dependências" no README).
+EXPORT_PARQUET = False
+PARQUET_FILENAME = "filtered_ppg.parquet"
 
 # --- Parâmetros dos Filtros ---
 # Frequência de amostragem esperada dos sinais.
 FS = 500.0
+# Frequência de amostragem (aproximada) do PPG filtrado. A faixa de interesse vai
+# só até 5 Hz, então o sinal é decimado antes da filtragem: os filtros processam
+# 10x menos amostras e o arquivo .npy salvo fica 10x menor.
+TARGET_FS = 50.0
 # Frequência de corte para o filtro passa-altas (High-pass).
 # Remove flutuações muito lentas (ex: respiração, movimento do corpo).
 HIGHPASS_CUTOFF = 0.5
@@ -34,10 +48,70 @@ LOWPASS_CUTOFF = 5.0
 HIGHPASS_FILTER_ORDER = 4
 LOWPASS_FILTER_ORDER = 8
 
+@lru_cache(maxsize=8)
+def design_ppg_filters(fs):
+    """
+    Projeta os filtros Butterworth passa-altas e passa-baixas do PPG em seções
+    de segunda ordem (SOS) para uma dada frequência de amostragem.
+
+    O resultado é memorizado por fs: como os registros costumam ter todos a mesma
+    frequência de amostragem, os filtros são projetados uma única vez por processo,
+    e registros com outra fs também passam a reaproveitar seu próprio projeto.
+
+    Args:
+        fs (float): A frequência de amostragem do sinal.
+
+    Returns:
+        tuple: Uma tupla (sos_hp, sos_lp). Cada filtro é None se sua frequência de
+               corte for inválida para a fs informada.
+    """
+    # Normaliza as frequências de corte pela frequência de Nyquist.
+    nyquist_freq = 0.5 * fs
+    high_cutoff_norm = HIGHPASS_CUTOFF / nyquist_freq
+    low_cutoff_norm = LOWPASS_CUTOFF / nyquist_freq
+
+    # Validação para garantir que cada frequência de corte é válida para a fs.
+    sos_hp = None
+    if 0 < high_cutoff_norm < 1:
+        sos_hp = butter(HIGHPASS_FILTER_ORDER, high_cutoff_norm, btype='highpass', analog=False, output='sos')
+    # Em seções de segunda ordem (SOS), o filtro de ordem 8 permanece numericamente
+    # estável, o que não é garantido com os coeficientes (b, a).
+    sos_lp = None
+    if 0 < low_cutoff_norm < 1:
+        sos_lp = butter(LOWPASS_FILTER_ORDER, low_cutoff_norm, btype='lowpass', analog=False, output='sos')
+    return sos_hp, sos_lp
+
+def save_filtered_ppg_parquet(parquet_path, filtered_records):
+    """
+    Salva os sinais PPG filtrados de vários registros em uma única tabela Parquet.
+
+    A tabela tem uma linha por amostra, com as colunas 'record_id' (categórica,
+    gravada com codificação de dicionário), 'fs', 'sample_idx' e 'ppg' (float32).
+
+    Args:
+        parquet_path (str): O caminho do arquivo .parquet de saída.
+        filtered_records (list): Lista de tuplas (nome_registro, fs, sinal_filtrado).
+    """
+    record_ids = [rec_name for rec_name, _, _ in filtered_records]
+    lengths = [len(signal) for _, _, signal in filtered_records]
+    table_df = pd.DataFrame({
+        'record_id': pd.Categorical(np.repeat(record_ids, lengths), categories=record_ids),
+        'fs': np.repeat([fs for _, fs, _ in filtered_records], lengths).astype(np.float32),
+        'sample_idx': np.concatenate([np.arange(n, dtype=np.int32) for n in lengths]),
+        'ppg': np.concatenate([signal for _, _, signal in filtered_records]).astype(np.float32, copy=False)
+    })
+    table_df.to_parquet(parquet_path, index=False, compression='snappy', row_group_size=1 << 20)
+
 def load_and_filter_ppg(record_name_base, raw_dir, fs_expected):
     """
-    Carrega um registro WFDB, extrai o sinal PPG, aplica um filtro passa-faixa
-    Butterworth, e retorna o sinal filtrado e a frequência de amostragem real.
+    Carrega um registro WFDB, extrai o sinal PPG, decima o sinal para TARGET_FS,
+    aplica um filtro passa-faixa Butterworth, e retorna o sinal filtrado e sua
+    frequência de amostragem (após a decimação).
+
+    Cada registro é independente dos demais, então esta função é executada em
+    paralelo (um registro por processo) a partir da execução principal. Por isso
+    os avisos não são impressos aqui: eles são devolvidos para serem impressos
+    pelo processo principal, na ordem dos registros.
 
     Args:
         record_name_base (str): O nome base do registro (ex: 's1_run').
@@ -45,93 +119,143 @@ def load_and_filter_ppg(record_name_base, raw_dir, fs_expected):
         fs_expected (float): A frequência de amostragem esperada para verificação.
 
     Returns:
-        tuple: Uma tupla contendo (sinal_ppg_filtrado, fs_real) ou (None, None).
+        tuple: Uma tupla contendo (sinal_ppg_filtrado, fs_real, avisos) ou (None, None, avisos),
+               onde 'avisos' é a lista de mensagens geradas durante o processamento.
     """
     record_path = os.path.join(raw_dir, record_name_base)
+    messages = []
     
     try:
-        # Carrega o registro (sinais e metadados).
-        record = wfdb.rdrecord(record_path)
-        signal_data = record.p_signal 
-        current_fs = record.fs
+        # Lê apenas o cabeçalho do registro (metadados); os sinais são lidos depois,
+        # somente para o canal PPG.
+        header = wfdb.rdheader(record_path)
+        current_fs = header.fs
 
         # Verifica se a frequência de amostragem do arquivo é a esperada.
-        if record.fs != fs_expected:
-            print(f"  Atenção: Frequência de amostragem do arquivo ({record.fs} Hz) "
-                  f"difere da esperada ({fs_expected} Hz). Usando fs do arquivo.")
+        if header.fs != fs_expected:
+            messages.append(f"  Atenção: Frequência de amostragem do arquivo ({header.fs} Hz) "
+                            f"difere da esperada ({fs_expected} Hz). Usando fs do arquivo.")
 
         # Encontra o índice do primeiro canal PPG (contendo 'PLETH').
         ppg_channel_index = -1
-        if record.sig_name:
-            for i, sig_name in enumerate(record.sig_name):
+        if header.sig_name:
+            for i, sig_name in enumerate(header.sig_name):
                 if 'PLETH' in sig_name.upper():
                     ppg_channel_index = i
                     break # Usa o primeiro canal 'PLETH' que encontrar.
         
         if ppg_channel_index == -1:
-            print(f"  ERRO: Canal 'PLETH' não encontrado no registro {record_name_base}.")
-            return None, None
+            messages.append(f"  ERRO: Canal 'PLETH' não encontrado no registro {record_name_base}.")
+            return None, None, messages
+
+        # Carrega somente o canal PPG do arquivo de sinais, em vez de todos os canais,
+        # já convertido para float32 (metade dos bytes de float64).
+        record = wfdb.rdrecord(record_path, channels=[ppg_channel_index], return_res=32)
+        ppg_signal_raw = record.p_signal[:, 0]
 
-        ppg_signal_raw = signal_data[:, ppg_channel_index]
+        # --- Decimação ---
+        # Reduz a taxa para ~TARGET_FS com filtro anti-aliasing FIR de fase zero
+        # (sem deslocar o sinal no tempo). Só é feita se o fator for de pelo menos 2.
+        decimation_factor = int(round(current_fs / TARGET_FS))
+        if decimation_factor >= 2:
+            ppg_signal_raw = decimate(ppg_signal_raw, decimation_factor, ftype='fir', zero_phase=True)
+            current_fs = current_fs / decimation_factor
+        if current_fs != TARGET_FS:
+            messages.append(f"  Atenção: fs após a decimação ({current_fs} Hz) difere de TARGET_FS "
+                            f"({TARGET_FS} Hz). A fs real é gravada junto com o sinal.")
 
-        # --- Aplicação do Filtro Passa-Faixa em duas etapas ---
+        # --- Aplicação do Filtro Passa-Faixa ---
+        # Os filtros são projetados em seções de segunda ordem e aplicados com
+        # 'sosfiltfilt' (ida e volta), sem atraso de fase.
         
+        # Obtém os filtros para a fs do arquivo (projetados uma única vez por fs).
+        sos_hp, sos_lp = design_ppg_filters(current_fs)
+
         # Etapa 1: Filtro Passa-Altas (para remover flutuação da linha de base).
-        nyquist_freq = 0.5 * current_fs
-        high_cutoff_norm = HIGHPASS_CUTOFF / nyquist_freq
-        
-        # Validação para garantir que a frequência de corte é válida para a fs atual.
-        if high_cutoff_norm <= 0 or high_cutoff_norm >= 1:
-            print(f"  Aviso: Frequência de corte do passa-altas é inválida. Pulando filtro.")
-            ppg_after_hp = ppg_signal_raw
+        sections = []
+        if sos_hp is None:
+            messages.append(f"  Aviso: Frequência de corte do passa-altas é inválida. Pulando filtro.")
         else:
-            b_hp, a_hp = butter(HIGHPASS_FILTER_ORDER, high_cutoff_norm, btype='highpass', analog=False)
-            ppg_after_hp = filtfilt(b_hp, a_hp, ppg_signal_raw)
+            sections.append(sos_hp)
 
         # Etapa 2: Filtro Passa-Baixas (para remover ruído de alta frequência).
-        low_cutoff_norm = LOWPASS_CUTOFF / nyquist_freq
-        
-        if low_cutoff_norm <= 0 or low_cutoff_norm >= 1:
-            print(f"  Aviso: Frequência de corte do passa-baixas é inválida. Pulando filtro.")
-            ppg_after_lp = ppg_after_hp
+        if sos_lp is None:
+            messages.append(f"  Aviso: Frequência de corte do passa-baixas é inválida. Pulando filtro.")
+        else:
+            sections.append(sos_lp)
+
+        # As seções dos dois filtros são empilhadas em uma única cascata e aplicadas
+        # em uma só passada de ida e volta sobre o sinal, sem percorrê-lo inteiro duas
+        # vezes. A resposta em frequência é a mesma da aplicação em sequência
+        # (passa-altas e depois passa-baixas); só as bordas do sinal mudam um pouco,
+        # porque o preenchimento e as condições iniciais do sosfiltfilt passam a ser
+        # calculados para a cascata combinada.
+        # Os coeficientes continuam em float64 (a estabilidade numérica dos filtros de
+        # ordem alta depende disso); o resultado volta para float32 antes de ser salvo.
+        if sections:
+            ppg_filtered = sosfiltfilt(np.vstack(sections), ppg_signal_raw)
         else:
-            b_lp, a_lp = butter(LOWPASS_FILTER_ORDER, low_cutoff_norm, btype='lowpass', analog=False)
-            # O filtro passa-baixa é aplicado no sinal que JÁ passou pelo filtro passa-altas.
-            ppg_after_lp = filtfilt(b_lp, a_lp, ppg_after_hp)
+            ppg_filtered = ppg_signal_raw
+        ppg_filtered = ppg_filtered.astype(np.float32, copy=False)
             
-        return ppg_after_lp, current_fs
+        return ppg_filtered, current_fs, messages
 
     except Exception as e:
-        print(f"  ERRO ao processar o registro {record_name_base}: {e}")
-        return None, None
+        messages.append(f"  ERRO ao processar o registro {record_name_base}: {e}")
+        return None, None, messages
 
 # --- 3. Execução Principal ---
 if __name__ == "__main__":
+    if EXPORT_PARQUET and importlib.util.find_spec("pyarrow") is None:
+        print("🚨 ERRO: EXPORT_PARQUET = True requer o pacote pyarrow (pip install pyarrow).")
+        exit()
+
     os.makedirs(FILTERED_DATA_DIR, exist_ok=True)
     print(f"Diretório de saída para dados filtrados: {os.path.abspath(FILTERED_DATA_DIR)}")
 
-    # Encontra todos os registros a serem processados.
-    record_names = sorted([os.path.splitext(f)[0] for f in os.listdir(RAW_DATA_DIR) if f.endswith(".hea")])
+    # Encontra todos os registros a serem processados. 'os.scandir' já traz o tipo de
+    # cada entrada junto com a listagem, sem uma chamada 'stat' extra por arquivo.
+    with os.scandir(RAW_DATA_DIR) as entries:
+        record_names = sorted([os.path.splitext(e.name)[0] for e in entries
+                               if e.is_file() and e.name.endswith(".hea")])
     if not record_names:
         print(f"Nenhum arquivo de registro (.hea) encontrado em {os.path.abspath(RAW_DATA_DIR)}")
         exit()
 
     print(f"Encontrados {len(record_names)} registros para processar.")
 
-    # Itera sobre cada registro, aplicando o filtro e salvando o resultado.
-    for rec_name in record_names:
-        print(f"\nProcessando registro: {rec_name}...")
-        
-        # Chama a função principal de carregamento e filtragem.
-        filtered_ppg, actual_fs = load_and_filter_ppg(rec_name, RAW_DATA_DIR, FS)
-        
-        # Salva o sinal filtrado se o processamento foi bem-sucedido.
-        if filtered_ppg is not None:
-            output_filename = f"{rec_name}_filtered_c5.npy"
-            save_path = os.path.join(FILTERED_DATA_DIR, output_filename)
-            np.save(save_path, filtered_ppg)
-            print(f"  ✅ Sinal filtrado salvo em: {save_path} (fs: {actual_fs} Hz)")
-        else:
-            print(f"  Não foi possível gerar o sinal filtrado para {rec_name}.")
+    # Os registros são independentes: o carregamento e a filtragem de cada um rodam
+    # em um processo separado, e os sinais filtrados são salvos aqui, na ordem original,
+    # conforme ficam prontos.
+    n_processes = max(1, min(os.cpu_count() or 1, len(record_names)))
+    filter_record = partial(load_and_filter_ppg, raw_dir=RAW_DATA_DIR, fs_expected=FS)
+    filtered_records = []
+    with ProcessPoolExecutor(max_workers=n_processes) as executor:
+        results = executor.map(filter_record, record_names)
+        for rec_name, (filtered_ppg, actual_fs, messages) in zip(record_names, results):
+            print(f"\nProcessando registro: {rec_name}...")
+            for message in messages:
+                print(message)
+            
+            # Salva o sinal filtrado se o processamento foi bem-sucedido.
+            if filtered_ppg is not None:
+                output_filename = f"{rec_name}_filtered_c5.npy"
+                save_path = os.path.join(FILTERED_DATA_DIR, output_filename)
+                np.save(save_path, filtered_ppg)
+                # A fs do sinal salvo (após a decimação) vai em um arquivo .json ao lado
+                # do .npy, para que as etapas seguintes não precisem supor a taxa.
+                with open(os.path.splitext(save_path)[0] + ".json", "w") as f:
+                    json.dump({"fs": actual_fs}, f)
+                print(f"  ✅ Sinal filtrado salvo em: {save_path} (fs: {actual_fs} Hz)")
+                if EXPORT_PARQUET:
+                    filtered_records.append((rec_name, actual_fs, filtered_ppg))
+            else:
+                print(f"  Não foi possível gerar o sinal filtrado para {rec_name}.")
+
+    # Exporta a tabela única com todos os registros, se habilitado.
+    if EXPORT_PARQUET and filtered_records:
+        parquet_path = os.path.join(FILTERED_DATA_DIR, PARQUET_FILENAME)
+        save_filtered_ppg_parquet(parquet_path, filtered_records)
+        print(f"\n✅ Tabela Parquet com {len(filtered_records)} registros salva em: {parquet_path}")
 
     print("\n--- Filtragem Concluída ---")
\ No newline at end of file
@@ -9,26 +9,82 @@ registro, permitindo uma avaliação visual final da performance do algoritmo.
 """
 
 import os
+from concurrent.futures import ProcessPoolExecutor
 import pandas as pd
 import numpy as np
-import matplotlib.pyplot as plt
+from _plot_common import get_clean_axes, init_plot_worker, save_figure
+
+# O leitor de CSV do pyarrow (multithread) é usado quando disponível;
+# sem ele, a leitura volta a ser feita pelo pandas.
+try:
+    from pyarrow import csv as pacsv
+except ImportError:
+    pacsv = None
 
 # --- 1. Configurações ---
 
-# Diretórios de entrada com os resultados em CSV.
+# Diretórios de entrada com os resultados em CSV (ou Parquet).
 # Altere os nomes das pastas se estiverem diferentes no seu projeto.
 PPG_RESULTS_DIR = "results/bpm_vfinal/" 
 ECG_TRUTH_DIR = "results/ground_truth/"
 
+# Extensões de arquivo de resultado aceitas (ver RESULTS_FORMAT em calculate_bpm_vfinal.py
+# e generate_ground_truth.py).
+RESULT_EXTENSIONS = (".csv", ".parquet")
+
 # Diretório de saída para os gráficos de comparação final.
 PLOT_OUTPUT_DIR = "outputs/final_comparison_filtered/"
+# Tamanho (em polegadas) da figura de cada gráfico.
+FIGURE_SIZE = (20, 7)
 
 # --- Parâmetros do Filtro de Outliers ---
 # Se um valor de BPM estiver a uma distância maior que este valor da mediana geral,
 # ele será considerado um outlier e substituído pela própria mediana.
 OUTLIER_THRESHOLD_BPM = 15.0
+# Estratégia de tratamento dos outliers:
+#   "median" (padrão): o outlier é substituído pela mediana da série.
+#   "clip": o outlier é apenas limitado à faixa [mediana - limiar, mediana + limiar],
+#           mantendo o lado do desvio (o gráfico resultante não é equivalente ao "median").
+OUTLIER_STRATEGY = "median"
+
+# --- 2. Funções Auxiliares ---
+
+def read_results(file_path, columns):
+    """
+    Lê apenas as colunas indicadas de um arquivo de resultados de BPM (.csv ou .parquet).
+
+    Arquivos .parquet são lidos com pd.read_parquet. Arquivos .csv usam o leitor
+    multithread do pyarrow quando ele está instalado, e pd.read_csv caso contrário.
+
+    Args:
+        file_path (str): O caminho do arquivo de resultados.
+        columns (list): Os nomes das colunas a serem lidas.
 
-# --- 2. Função Auxiliar para Filtragem ---
+    Returns:
+        pd.DataFrame: Os dados do arquivo.
+    """
+    if file_path.endswith(".parquet"):
+        return pd.read_parquet(file_path, columns=columns)
+    if pacsv is not None:
+        convert_options = pacsv.ConvertOptions(include_columns=columns)
+        return pacsv.read_csv(file_path, convert_options=convert_options).to_pandas()
+    return pd.read_csv(file_path, usecols=columns)
+
+def find_ground_truth(base_name):
+    """
+    Procura o arquivo de Ground Truth (ECG) de um registro, em qualquer formato aceito.
+
+    Args:
+        base_name (str): O nome base do registro (ex: 's1_run').
+
+    Returns:
+        str: O caminho do arquivo encontrado, ou None se não existir.
+    """
+    for extension in RESULT_EXTENSIONS:
+        ecg_path = os.path.join(ECG_TRUTH_DIR, f"{base_name}_ecg_bpm{extension}")
+        if os.path.exists(ecg_path):
+            return ecg_path
+    return None
 
 def filter_outliers(bpm_series, threshold):
     """
@@ -41,23 +97,126 @@ def filter_outliers(bpm_series, threshold):
     Returns:
         pd.Series: A nova série de BPM com os outliers suavizados.
     """
-    # Retorna a série original se ela estiver vazia.
-    if bpm_series.empty or bpm_series.isnull().all():
+    # Trabalha diretamente sobre o array NumPy (float32) da série, sem passar pelo
+    # alinhamento de índices do pandas.
+    values = bpm_series.to_numpy(dtype=np.float32)
+
+    # Retorna a série original se ela estiver vazia ou sem nenhum valor válido.
+    if values.size == 0 or np.isnan(values).all():
         return bpm_series
     
-    # Calcula a mediana de toda a série temporal de BPM.
-    median_bpm = bpm_series.median()
-    
-    # Cria uma cópia para evitar modificar os dados originais.
-    filtered_series = bpm_series.copy()
+    # Calcula a mediana de toda a série temporal de BPM, ignorando valores ausentes.
+    median_bpm = np.nanmedian(values)
     
-    # Cria uma máscara booleana que é 'True' para todos os pontos que são outliers.
-    outlier_mask = np.abs(filtered_series - median_bpm) > threshold
+    # Substitui, em uma única passada, os outliers pelo valor da mediana.
+    # Valores ausentes (NaN) nunca são outliers e são mantidos.
+    filtered_values = np.where(np.abs(values - median_bpm) > threshold, median_bpm, values)
     
-    # Usa a máscara para substituir o valor dos outliers pelo valor da mediana.
-    filtered_series[outlier_mask] = median_bpm
+    # Devolve uma nova série, com o mesmo índice e nome da original.
+    return pd.Series(filtered_values, index=bpm_series.index, name=bpm_series.name)
+
+def filter_outliers_clip(bpm_series, threshold):
+    """
+    Limita os outliers de uma série de BPM à faixa [mediana - limiar, mediana + limiar].
+
+    Diferente de filter_outliers, o outlier não vira a mediana: ele é trazido até
+    o limite mais próximo da faixa.
+
+    Args:
+        bpm_series (pd.Series): A série de dados de BPM a ser filtrada.
+        threshold (float): A distância máxima da mediana para um ponto não ser considerado outlier.
+
+    Returns:
+        pd.Series: A nova série de BPM com os outliers limitados.
+    """
+    # Assim como filter_outliers, trabalha diretamente sobre o array NumPy (float32).
+    values = bpm_series.to_numpy(dtype=np.float32)
+
+    # Retorna a série original se ela estiver vazia ou sem nenhum valor válido.
+    if values.size == 0 or np.isnan(values).all():
+        return bpm_series
+
+    # Calcula a mediana (ignorando valores ausentes) e limita os valores à faixa em torno dela.
+    # Valores ausentes (NaN) são mantidos.
+    median_bpm = np.nanmedian(values)
+    clipped_values = np.clip(values, median_bpm - threshold, median_bpm + threshold)
+    return pd.Series(clipped_values, index=bpm_series.index, name=bpm_series.name)
+
+# Função de filtragem de outliers selecionada por OUTLIER_STRATEGY.
+OUTLIER_FILTERS = {"median": filter_outliers, "clip": filter_outliers_clip}
+
+def plot_record(ppg_filename):
+    """
+    Carrega, filtra e plota os resultados de BPM (PPG e ECG) de um único registro.
+
+    Cada registro é independente dos demais, então esta função é executada em
+    paralelo (um registro por processo) a partir da execução principal. As
+    mensagens de status são devolvidas para serem impressas pelo processo principal.
+
+    Args:
+        ppg_filename (str): O nome do arquivo de resultados do PPG.
+
+    Returns:
+        list: As mensagens de status geradas durante o processamento.
+    """
+    messages = []
+    # Extrai o nome base para encontrar o arquivo de ground truth correspondente.
+    base_name = ppg_filename.split('_bpm_results')[0]
     
-    return filtered_series
+    try:
+        # --- Carregamento e Filtragem dos Dados ---
+        outlier_filter = OUTLIER_FILTERS[OUTLIER_STRATEGY]
+        
+        # Carrega e filtra os dados do nosso algoritmo PPG.
+        ppg_path = os.path.join(PPG_RESULTS_DIR, ppg_filename)
+        df_ppg = read_results(ppg_path, ['tempo_s', 'bpm'])
+        if not df_ppg.empty:
+            df_ppg['bpm_filtered'] = outlier_filter(df_ppg['bpm'], OUTLIER_THRESHOLD_BPM)
+
+        # Encontra, carrega e filtra os dados do Ground Truth (ECG).
+        ecg_path = find_ground_truth(base_name)
+        
+        df_ecg = None
+        if ecg_path is not None:
+            df_ecg = read_results(ecg_path, ['tempo_s', 'bpm_ecg'])
+            if not df_ecg.empty:
+                df_ecg['bpm_filtered'] = outlier_filter(df_ecg['bpm_ecg'], OUTLIER_THRESHOLD_BPM)
+        else:
+            messages.append(f"  ℹ️  Arquivo Ground Truth '{base_name}_ecg_bpm' (.csv ou .parquet) não encontrado.")
+
+        # --- Plotagem Sobreposta ---
+        fig, ax = get_clean_axes(FIGURE_SIZE)
+        
+        # Plota a linha do ECG (Ground Truth) como referência principal.
+        if df_ecg is not None and not df_ecg.empty:
+            ax.plot(df_ecg['tempo_s'], df_ecg['bpm_filtered'], 
+                     color='black', linestyle='-', linewidth=2.5, 
+                     label='BPM Real (ECG - Pós-Filtro)')
+
+        # Plota a linha do PPG (Nosso Algoritmo) de forma pontilhada para comparação.
+        if not df_ppg.empty:
+            ax.plot(df_ppg['tempo_s'], df_ppg['bpm_filtered'], 
+                     color='deepskyblue', linestyle='--', linewidth=2.0, 
+                     label='BPM Estimado (PPG - Pós-Filtro)')
+        
+        # Configuração de títulos e legendas para clareza.
+        activity = base_name.split('_')[1]
+        ax.set_title(f'Comparação Final (Pós-Filtro de Outliers)\nAtividade: {activity.capitalize()} - Registro: {base_name}', fontsize=16)
+        ax.set_xlabel('Tempo da Atividade (s)', fontsize=12)
+        ax.set_ylabel('Batimentos por Minuto (BPM)', fontsize=12)
+        ax.legend(fontsize=10)
+        ax.grid(True, which='both', linestyle='--', linewidth=0.5)
+        ax.set_ylim(40, 220) # Eixo Y fixo para facilitar a comparação visual entre gráficos.
+
+        # Salva a figura no diretório de saída.
+        output_path = os.path.join(PLOT_OUTPUT_DIR, f"{base_name}_filtered_comparison.png")
+        save_figure(fig, output_path)
+        
+        messages.append(f"  ✅ Gráfico de comparação filtrado salvo em: {output_path}")
+
+    except Exception as e:
+        messages.append(f"  ❌ ERRO ao processar o arquivo {ppg_filename}: {e}")
+    return messages
 
 # --- 3. Execução Principal ---
 if __name__ == "__main__":
@@ -65,75 +224,29 @@ if __name__ == "__main__":
     os.makedirs(PLOT_OUTPUT_DIR, exist_ok=True)
     print(f"Diretório de saída para os gráficos: {os.path.abspath(PLOT_OUTPUT_DIR)}")
 
-    # Encontra os arquivos CSV do nosso algoritmo para guiar o processo.
-    # Ajuste o sufixo '.csv' se seus arquivos tiverem um nome mais específico.
-    ppg_result_files = sorted([f for f in os.listdir(PPG_RESULTS_DIR) if f.endswith(".csv")])
+    # Encontra os arquivos de resultado (.csv ou .parquet) do nosso algoritmo para guiar o processo.
+    # Ajuste as extensões em RESULT_EXTENSIONS se seus arquivos tiverem um nome mais específico.
+    # 'os.scandir' já traz o tipo de cada entrada, sem uma chamada 'stat' extra por arquivo.
+    with os.scandir(PPG_RESULTS_DIR) as entries:
+        ppg_result_files = sorted([e.name for e in entries if e.is_file() and e.name.endswith(RESULT_EXTENSIONS)])
     
     if not ppg_result_files:
-        print(f"Nenhum arquivo .csv encontrado em '{PPG_RESULTS_DIR}'.")
+        print(f"Nenhum arquivo .csv ou .parquet encontrado em '{PPG_RESULTS_DIR}'.")
         exit()
 
     print(f"\n--- Gerando Gráficos Finais com Filtro de Outliers ({len(ppg_result_files)} arquivos) ---")
 
-    # Itera sobre cada arquivo de resultado encontrado.
-    for ppg_filename in ppg_result_files:
-        # Extrai o nome base para encontrar o arquivo de ground truth correspondente.
-        base_name = ppg_filename.split('_bpm_results')[0]
-        print(f"\n--- Processando e Plotando: {base_name} ---")
-        
-        try:
-            # --- Carregamento e Filtragem dos Dados ---
-            
-            # Carrega e filtra os dados do nosso algoritmo PPG.
-            ppg_path = os.path.join(PPG_RESULTS_DIR, ppg_filename)
-            df_ppg = pd.read_csv(ppg_path)
-            if not df_ppg.empty:
-                df_ppg['bpm_filtered'] = filter_outliers(df_ppg['bpm'], OUTLIER_THRESHOLD_BPM)
-
-            # Encontra, carrega e filtra os dados do Ground Truth (ECG).
-            ecg_filename = f"{base_name}_ecg_bpm.csv"
-            ecg_path = os.path.join(ECG_TRUTH_DIR, ecg_filename)
-            
-            df_ecg = None
-            if os.path.exists(ecg_path):
-                df_ecg = pd.read_csv(ecg_path)
-                if not df_ecg.empty:
-                    df_ecg['bpm_filtered'] = filter_outliers(df_ecg['bpm_ecg'], OUTLIER_THRESHOLD_BPM)
-            else:
-                print(f"  ℹ️  Arquivo Ground Truth '{ecg_filename}' não encontrado.")
-
-            # --- Plotagem Sobreposta ---
-            plt.figure(figsize=(20, 7))
-            
-            # Plota a linha do ECG (Ground Truth) como referência principal.
-            if df_ecg is not None and not df_ecg.empty:
-                plt.plot(df_ecg['tempo_s'], df_ecg['bpm_filtered'], 
-                         color='black', linestyle='-', linewidth=2.5, 
-                         label='BPM Real (ECG - Pós-Filtro)')
-
-            # Plota a linha do PPG (Nosso Algoritmo) de forma pontilhada para comparação.
-            if not df_ppg.empty:
-                plt.plot(df_ppg['tempo_s'], df_ppg['bpm_filtered'], 
-                         color='deepskyblue', linestyle='--', linewidth=2.0, 
-                         label='BPM Estimado (PPG - Pós-Filtro)')
-            
-            # Configuração de títulos e legendas para clareza.
-            activity = base_name.split('_')[1]
-            plt.title(f'Comparação Final (Pós-Filtro de Outliers)\nAtividade: {activity.capitalize()} - Registro: {base_name}', fontsize=16)
-            plt.xlabel('Tempo da Atividade (s)', fontsize=12)
-            plt.ylabel('Batimentos por Minuto (BPM)', fontsize=12)
-            plt.legend(fontsize=10)
-            plt.grid(True, which='both', linestyle='--', linewidth=0.5)
-            plt.ylim(40, 220) # Eixo Y fixo para facilitar a comparação visual entre gráficos.
-
-            # Salva a figura no diretório de saída.
-            output_path = os.path.join(PLOT_OUTPUT_DIR, f"{base_name}_filtered_comparison.png")
-            plt.savefig(output_path)
-            plt.close() # Libera a memória da figura.
-            
-            print(f"  ✅ Gráfico de comparação filtrado salvo em: {output_path}")
-
-        except Exception as e:
-            print(f"  ❌ ERRO ao processar o arquivo {ppg_filename}: {e}")
+    # Os registros são independentes: cada gráfico é gerado e salvo em um processo
+    # separado, e as mensagens são impressas aqui, na ordem original.
+    n_processes = max(1, min(os.cpu_count() or 1, len(ppg_result_files)))
+    # Cada processo cria sua figura reutilizável uma única vez, ao ser iniciado.
+    with ProcessPoolExecutor(max_workers=n_processes, initializer=init_plot_worker,
+                             initargs=(FIGURE_SIZE,)) as executor:
+        results = executor.map(plot_record, ppg_result_files)
+        for ppg_filename, messages in zip(ppg_result_files, results):
+            base_name = ppg_filename.split('_bpm_results')[0]
+            print(f"\n--- Processando e Plotando: {base_name} ---")
+            for message in messages:
+                print(message)
             
     print("\n--- Plotagem Final Concluída ---")
\ No newline at end of file
@@ -11,8 +11,10 @@ de ruído inicial foi bem-sucedida.
 """
 
 import os
+import json
+from concurrent.futures import ProcessPoolExecutor
 import numpy as np
-import matplotlib.pyplot as plt
+from _plot_common import get_clean_axes, init_plot_worker, minmax_decimate, save_figure
 
 # --- 1. Configurações ---
 
@@ -30,48 +32,64 @@ PLOT_OUTPUT_DIR = "outputs/output_filtered_1/"
 # Define o número de amostras a serem plotadas para um "zoom" no início do sinal.
 # Defina como None para plotar o sinal completo.
 SAMPLES_TO_PLOT = 10000 
-# Frequência de amostragem (Hz) para criar o eixo do tempo em segundos.
+# Frequência de amostragem (Hz) do IMU, para criar o eixo do tempo em segundos.
+# A do PPG filtrado (decimado por passa_faixa_ppg.py) é lida do .json gravado ao
+# lado de cada .npy.
 FS = 500.0
+# Tamanho (em polegadas) da figura de cada gráfico.
+FIGURE_SIZE = (15, 5)
 
-def plot_filtered_ppg(signal_data, base_filename, output_dir):
+def plot_filtered_ppg(signal_data, ppg_fs, base_filename, output_dir):
     """
     Plota e salva o gráfico para um sinal PPG (1D) que já foi filtrado.
 
     Args:
         signal_data (np.array): O vetor de dados do sinal PPG.
+        ppg_fs (float): A frequência de amostragem do sinal PPG filtrado (em Hz).
         base_filename (str): O nome base do registro para o título e nome do arquivo.
         output_dir (str): O diretório onde o gráfico será salvo.
+
+    Returns:
+        str: A mensagem de status do salvamento do gráfico.
     """
     # Lógica para "zooming": fatia o sinal se SAMPLES_TO_PLOT for definido.
-    if SAMPLES_TO_PLOT and len(signal_data) > SAMPLES_TO_PLOT:
-        signal_to_plot = signal_data[:SAMPLES_TO_PLOT]
+    # SAMPLES_TO_PLOT está na taxa original (FS); é convertido para a taxa do PPG
+    # para que o "zoom" cubra o mesmo intervalo de tempo que o do IMU.
+    ppg_samples_to_plot = SAMPLES_TO_PLOT and int(SAMPLES_TO_PLOT * ppg_fs / FS)
+    # Apenas o trecho plotado é lido do disco (o sinal chega mapeado em memória).
+    if ppg_samples_to_plot and len(signal_data) > ppg_samples_to_plot:
+        signal_to_plot = np.asarray(signal_data[:ppg_samples_to_plot])
         zoom_info = f"(Primeiras {len(signal_to_plot)} Amostras)"
     else:
         signal_to_plot = signal_data
         zoom_info = "(Sinal Completo)"
     
     # Cria um eixo de tempo em segundos dividindo o número de amostras pela frequência de amostragem.
-    time_axis = np.arange(len(signal_to_plot)) / FS
+    time_axis = np.arange(len(signal_to_plot)) / ppg_fs
 
-    plt.figure(figsize=(15, 5))
-    plt.plot(time_axis, signal_to_plot, label='Sinal PPG Pós-filtro', color='teal')
+    # Reduz o trecho apenas para o desenho, mantendo o mínimo e o máximo de cada bloco
+    # (o título mantém o número real de amostras).
+    time_axis, signal_to_plot = minmax_decimate(time_axis, signal_to_plot)
+
+    fig, ax = get_clean_axes(FIGURE_SIZE)
+    ax.plot(time_axis, signal_to_plot, label='Sinal PPG Pós-filtro', color='teal')
     
-    plt.title(f'Sinal PPG Filtrado (Passa-Faixa): {base_filename} {zoom_info}')
-    plt.xlabel('Tempo (s)')
-    plt.ylabel('Amplitude Filtrada')
-    plt.grid(True, linestyle='--', alpha=0.6)
-    plt.legend()
-    plt.tight_layout()
+    ax.set_title(f'Sinal PPG Filtrado (Passa-Faixa): {base_filename} {zoom_info}')
+    ax.set_xlabel('Tempo (s)')
+    ax.set_ylabel('Amplitude Filtrada')
+    ax.grid(True, linestyle='--', alpha=0.6)
+    ax.legend()
+    fig.tight_layout()
     
     # Salva a figura do gráfico no diretório de saída.
     plot_filename = f"{base_filename}_ppg_filtered.png"
     save_path = os.path.join(output_dir, plot_filename)
     try:
-        plt.savefig(save_path)
-        print(f"  ✅ Gráfico PPG Filtrado salvo em: {plot_filename}")
+        save_figure(fig, save_path)
+        message = f"  ✅ Gráfico PPG Filtrado salvo em: {plot_filename}"
     except Exception as e:
-        print(f"  ❌ ERRO ao salvar o gráfico PPG {save_path}: {e}")
-    plt.close() # Libera a memória da figura.
+        message = f"  ❌ ERRO ao salvar o gráfico PPG {save_path}: {e}"
+    return message
 
 def plot_filtered_imu(signal_data, base_filename, output_dir):
     """
@@ -81,15 +99,17 @@ def plot_filtered_imu(signal_data, base_filename, output_dir):
         signal_data (np.array): O array 2D com os dados do IMU (n_amostras, 3 eixos).
         base_filename (str): O nome base do registro para o título e nome do arquivo.
         output_dir (str): O diretório onde o gráfico será salvo.
+
+    Returns:
+        str: A mensagem de status do salvamento do gráfico.
     """
     # Valida se os dados do IMU têm o formato esperado (3 colunas/eixos).
     if signal_data.ndim != 2 or signal_data.shape[1] != 3:
-        print(f"  AVISO: Sinal IMU para {base_filename} não tem 3 eixos. Pulando.")
-        return
+        return f"  AVISO: Sinal IMU para {base_filename} não tem 3 eixos. Pulando."
 
     # Lógica de "zooming" similar à do PPG.
     if SAMPLES_TO_PLOT and len(signal_data) > SAMPLES_TO_PLOT:
-        signal_to_plot = signal_data[:SAMPLES_TO_PLOT]
+        signal_to_plot = np.asarray(signal_data[:SAMPLES_TO_PLOT])
         zoom_info = f"(Primeiras {len(signal_to_plot)} Amostras)"
     else:
         signal_to_plot = signal_data
@@ -97,27 +117,75 @@ def plot_filtered_imu(signal_data, base_filename, output_dir):
 
     time_axis = np.arange(len(signal_to_plot)) / FS
 
-    plt.figure(figsize=(15, 5))
-    # Plota cada coluna do array (eixo) como uma linha separada no mesmo gráfico.
-    plt.plot(time_axis, signal_to_plot[:, 0], label='Eixo X', color='royalblue')
-    plt.plot(time_axis, signal_to_plot[:, 1], label='Eixo Y', color='forestgreen')
-    plt.plot(time_axis, signal_to_plot[:, 2], label='Eixo Z', color='darkorange')
+    fig, ax = get_clean_axes(FIGURE_SIZE)
+    # Plota cada coluna do array (eixo) como uma linha separada no mesmo gráfico,
+    # reduzida apenas para o desenho com o mínimo e o máximo de cada bloco.
+    for axis, label, color in ((0, 'Eixo X', 'royalblue'), (1, 'Eixo Y', 'forestgreen'),
+                               (2, 'Eixo Z', 'darkorange')):
+        ax.plot(*minmax_decimate(time_axis, signal_to_plot[:, axis]), label=label, color=color)
     
-    plt.title(f'Sinal IMU Filtrado (Passa-Baixa): {base_filename} {zoom_info}')
-    plt.xlabel('Tempo (s)')
-    plt.ylabel('Aceleração Filtrada (g)')
-    plt.grid(True, linestyle='--', alpha=0.6)
-    plt.legend()
-    plt.tight_layout()
+    ax.set_title(f'Sinal IMU Filtrado (Passa-Baixa): {base_filename} {zoom_info}')
+    ax.set_xlabel('Tempo (s)')
+    ax.set_ylabel('Aceleração Filtrada (g)')
+    ax.grid(True, linestyle='--', alpha=0.6)
+    ax.legend()
+    fig.tight_layout()
     
     plot_filename = f"{base_filename}_imu_filtered.png"
     save_path = os.path.join(output_dir, plot_filename)
     try:
-        plt.savefig(save_path)
-        print(f"  ✅ Gráfico IMU Filtrado salvo em: {plot_filename}")
+        save_figure(fig, save_path)
+        message = f"  ✅ Gráfico IMU Filtrado salvo em: {plot_filename}"
     except Exception as e:
-        print(f"  ❌ ERRO ao salvar o gráfico IMU {save_path}: {e}")
-    plt.close()
+        message = f"  ❌ ERRO ao salvar o gráfico IMU {save_path}: {e}"
+    return message
+
+def plot_record(ppg_filename):
+    """
+    Carrega e plota os sinais PPG e IMU filtrados de um único registro.
+
+    Cada registro é independente dos demais, então esta função é executada em
+    paralelo (um registro por processo) a partir da execução principal. As
+    mensagens de status são devolvidas para serem impressas pelo processo principal.
+
+    Args:
+        ppg_filename (str): O nome do arquivo .npy do PPG filtrado.
+
+    Returns:
+        list: As mensagens de status geradas durante o processamento.
+    """
+    messages = []
+    # Extrai o nome base do arquivo para poder encontrar o arquivo IMU correspondente.
+    # Ex: "s1_run_filtered_c5.npy" -> "s1_run"
+    base_name = ppg_filename.replace('_filtered_c5.npy', '')
+
+    # Processa e plota o sinal PPG.
+    try:
+        ppg_path = os.path.join(FILTERED_PPG_DIR, ppg_filename)
+        # O arquivo é mapeado em memória (mmap): só as amostras plotadas são lidas do disco.
+        ppg_signal = np.load(ppg_path, mmap_mode='r')
+        # A fs do PPG filtrado é gravada por passa_faixa_ppg.py ao lado do .npy.
+        with open(os.path.splitext(ppg_path)[0] + ".json") as f:
+            ppg_fs = float(json.load(f)["fs"])
+        messages.append(plot_filtered_ppg(ppg_signal, ppg_fs, base_name, PLOT_OUTPUT_DIR))
+    except Exception as e:
+        messages.append(f"  ❌ ERRO ao processar o arquivo PPG {ppg_filename}: {e}")
+        return messages
+
+    # Encontra, carrega e plota o sinal IMU correspondente.
+    imu_filename = f"{base_name}_imu.npy"
+    imu_path = os.path.join(FILTERED_IMU_DIR, imu_filename)
+    
+    # O arquivo é aberto diretamente (sem verificar antes se ele existe, o que custaria
+    # uma chamada 'stat' extra); a ausência do arquivo é tratada pela exceção.
+    try:
+        imu_signal = np.load(imu_path, mmap_mode='r')
+        messages.append(plot_filtered_imu(imu_signal, base_name, PLOT_OUTPUT_DIR))
+    except FileNotFoundError:
+        messages.append(f"  ℹ️  Arquivo IMU filtrado correspondente não encontrado em '{FILTERED_IMU_DIR}'.")
+    except Exception as e:
+        messages.append(f"  ❌ ERRO ao processar o arquivo IMU {imu_filename}: {e}")
+    return messages
 
 
 # --- 3. Execução Principal ---
@@ -130,38 +198,24 @@ if __name__ == "__main__":
     os.makedirs(PLOT_OUTPUT_DIR, exist_ok=True)
     print(f"Diretório de saída para os gráficos: {os.path.abspath(PLOT_OUTPUT_DIR)}")
 
-    # Usa os arquivos de PPG como guia principal para o loop.
-    ppg_files = sorted([f for f in os.listdir(FILTERED_PPG_DIR) if f.endswith("_filtered_c5.npy")])
+    # Usa os arquivos de PPG como guia principal para o loop ('os.scandir' já traz o
+    # tipo de cada entrada, sem uma chamada 'stat' extra por arquivo).
+    with os.scandir(FILTERED_PPG_DIR) as entries:
+        ppg_files = sorted([e.name for e in entries if e.is_file() and e.name.endswith("_filtered_c5.npy")])
     
     print(f"\n🔍 {len(ppg_files)} arquivos de sinal PPG filtrado encontrados para plotar.")
 
-    for ppg_filename in ppg_files:
-        
-        # Extrai o nome base do arquivo para poder encontrar o arquivo IMU correspondente.
-        # Ex: "s1_run_filtered_c5.npy" -> "s1_run"
-        base_name = ppg_filename.replace('_filtered_c5.npy', '')
-        print(f"\n--- Processando registro: {base_name} ---")
-
-        # Processa e plota o sinal PPG.
-        try:
-            ppg_path = os.path.join(FILTERED_PPG_DIR, ppg_filename)
-            ppg_signal = np.load(ppg_path)
-            plot_filtered_ppg(ppg_signal, base_name, PLOT_OUTPUT_DIR)
-        except Exception as e:
-            print(f"  ❌ ERRO ao processar o arquivo PPG {ppg_filename}: {e}")
-            continue
-
-        # Encontra, carrega e plota o sinal IMU correspondente.
-        imu_filename = f"{base_name}_imu.npy"
-        imu_path = os.path.join(FILTERED_IMU_DIR, imu_filename)
-        
-        if os.path.exists(imu_path):
-            try:
-                imu_signal = np.load(imu_path)
-                plot_filtered_imu(imu_signal, base_name, PLOT_OUTPUT_DIR)
-            except Exception as e:
-                print(f"  ❌ ERRO ao processar o arquivo IMU {imu_filename}: {e}")
-        else:
-            print(f"  ℹ️  Arquivo IMU filtrado correspondente não encontrado em '{FILTERED_IMU_DIR}'.")
+    # Os registros são independentes: os gráficos de cada um são gerados e salvos em
+    # um processo separado, e as mensagens são impressas aqui, na ordem original.
+    n_processes = max(1, min(os.cpu_count() or 1, len(ppg_files)))
+    # Cada processo cria sua figura reutilizável uma única vez, ao ser iniciado.
+    with ProcessPoolExecutor(max_workers=n_processes, initializer=init_plot_worker,
+                             initargs=(FIGURE_SIZE,)) as executor:
+        results = executor.map(plot_record, ppg_files)
+        for ppg_filename, messages in zip(ppg_files, results):
+            base_name = ppg_filename.replace('_filtered_c5.npy', '')
+            print(f"\n--- Processando registro: {base_name} ---")
+            for message in messages:
+                print(message)
 
     print(f"\n--- Plotagem dos Sinais Filtrados Concluída ---")
\ No newline at end of file
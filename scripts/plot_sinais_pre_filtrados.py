@@ -9,8 +9,10 @@ características dos dados antes de qualquer etapa de filtragem.
 """
 
 import os
+from concurrent.futures import ProcessPoolExecutor
 import numpy as np
-import matplotlib.pyplot as plt
+from _plot_common import get_clean_axes, init_plot_worker, minmax_decimate, save_figure
+from _signal_files import list_signal_files
 
 # --- 1. Configurações ---
 
@@ -19,6 +21,8 @@ import matplotlib.pyplot as plt
 PRE_FILTERED_PPG_DIR = "data/dataset_physionet/pre_filtered_ppg/"
 # Caminho para os dados de IMU brutos (3 eixos).
 PRE_FILTERED_IMU_DIR = "data/dataset_physionet/pre_filtered_imu/"
+# Os arquivos de sinal podem ser .npy ou .npz (quando salvar_raw_para_npy.py é
+# executado com COMPRESS = True).
 
 # --- Diretório de Saída ---
 # Pasta onde os gráficos dos sinais brutos serão salvos.
@@ -30,6 +34,45 @@ PLOT_OUTPUT_DIR = "outputs/output_pre_filtered/"
 SAMPLES_TO_PLOT = 10000 
 # Frequência de amostragem (Hz) para criar o eixo do tempo em segundos.
 FS = 500.0
+# Tamanho (em polegadas) da figura de cada gráfico.
+FIGURE_SIZE = (15, 5)
+
+# Eixo do tempo (em segundos) do trecho de "zoom", calculado uma única vez e apenas
+# fatiado a cada gráfico, em vez de recriado para cada registro.
+ZOOM_TIME_AXIS = np.arange(SAMPLES_TO_PLOT) / FS if SAMPLES_TO_PLOT else None
+
+def get_time_axis(n_samples):
+    """
+    Retorna o eixo do tempo (em segundos) para um trecho de n_samples amostras.
+
+    Args:
+        n_samples (int): O número de amostras do trecho a ser plotado.
+
+    Returns:
+        np.array: O eixo do tempo (uma fatia de ZOOM_TIME_AXIS, quando o trecho cabe nele).
+    """
+    if ZOOM_TIME_AXIS is not None and n_samples <= len(ZOOM_TIME_AXIS):
+        return ZOOM_TIME_AXIS[:n_samples]
+    return np.arange(n_samples) / FS
+
+def load_signal(file_path, signal_name):
+    """
+    Carrega um sinal salvo em .npy ou em .npz comprimido.
+
+    Arquivos .npy são mapeados em memória (mmap): só as amostras plotadas são lidas
+    do disco. Arquivos .npz são descomprimidos por inteiro.
+
+    Args:
+        file_path (str): O caminho do arquivo do sinal.
+        signal_name (str): O nome do array dentro do arquivo .npz (ex: 'ppg', 'imu').
+
+    Returns:
+        np.array: O sinal carregado.
+    """
+    if file_path.endswith(".npz"):
+        with np.load(file_path) as archive:
+            return archive[signal_name]
+    return np.load(file_path, mmap_mode='r')
 
 def plot_ppg_signal(signal_data, base_filename, output_dir):
     """
@@ -39,39 +82,47 @@ def plot_ppg_signal(signal_data, base_filename, output_dir):
         signal_data (np.array): O vetor de dados do sinal PPG.
         base_filename (str): O nome base do registro para o título e nome do arquivo.
         output_dir (str): O diretório onde o gráfico será salvo.
+
+    Returns:
+        str: A mensagem de status do salvamento do gráfico.
     """
     # Lógica para "zooming": fatia o sinal se SAMPLES_TO_PLOT for definido.
+    # Apenas o trecho plotado é lido do disco (o sinal chega mapeado em memória).
     if SAMPLES_TO_PLOT is not None and SAMPLES_TO_PLOT > 0 and len(signal_data) > SAMPLES_TO_PLOT:
-        signal_to_plot = signal_data[:SAMPLES_TO_PLOT]
+        signal_to_plot = np.asarray(signal_data[:SAMPLES_TO_PLOT])
         zoom_info = f"(Primeiras {len(signal_to_plot)} Amostras)"
     else:
         signal_to_plot = signal_data
         zoom_info = "(Sinal Completo)"
     
-    # Cria um eixo de tempo em segundos.
-    time_axis = np.arange(len(signal_to_plot)) / FS
+    # Obtém o eixo de tempo em segundos.
+    time_axis = get_time_axis(len(signal_to_plot))
+
+    # Reduz o trecho apenas para o desenho, mantendo o mínimo e o máximo de cada
+    # bloco (o título mantém o número real de amostras).
+    time_to_draw, signal_to_draw = minmax_decimate(time_axis, signal_to_plot)
 
-    # Cria a figura e plota os dados.
-    plt.figure(figsize=(15, 5))
-    plt.plot(time_axis, signal_to_plot, label='Sinal PPG (Média dos Canais)', color='crimson')
+    # Obtém a figura reutilizável (já limpa) e plota os dados.
+    fig, ax = get_clean_axes(FIGURE_SIZE)
+    ax.plot(time_to_draw, signal_to_draw, label='Sinal PPG (Média dos Canais)', color='crimson')
     
     # Configura os detalhes do gráfico.
-    plt.title(f'Sinal PPG Pré-filtrado: {base_filename} {zoom_info}')
-    plt.xlabel('Tempo (s)')
-    plt.ylabel('Amplitude Bruta')
-    plt.grid(True, linestyle='--', alpha=0.6)
-    plt.legend()
-    plt.tight_layout()
+    ax.set_title(f'Sinal PPG Pré-filtrado: {base_filename} {zoom_info}')
+    ax.set_xlabel('Tempo (s)')
+    ax.set_ylabel('Amplitude Bruta')
+    ax.grid(True, linestyle='--', alpha=0.6)
+    ax.legend()
+    fig.tight_layout()
     
     # Salva a figura do gráfico.
     plot_filename = f"{base_filename}_ppg_pre-filtered.png"
     save_path = os.path.join(output_dir, plot_filename)
     try:
-        plt.savefig(save_path)
-        print(f"  ✅ Gráfico PPG salvo em: {plot_filename}")
+        save_figure(fig, save_path)
+        message = f"  ✅ Gráfico PPG salvo em: {plot_filename}"
     except Exception as e:
-        print(f"  ❌ ERRO ao salvar o gráfico PPG {save_path}: {e}")
-    plt.close()
+        message = f"  ❌ ERRO ao salvar o gráfico PPG {save_path}: {e}"
+    return message
 
 def plot_imu_signal(signal_data, base_filename, output_dir):
     """
@@ -81,44 +132,96 @@ def plot_imu_signal(signal_data, base_filename, output_dir):
         signal_data (np.array): O array 2D com os dados do IMU (n_amostras, 3 eixos).
         base_filename (str): O nome base do registro.
         output_dir (str): O diretório onde o gráfico será salvo.
+
+    Returns:
+        str: A mensagem de status do salvamento do gráfico.
     """
     # Valida o formato dos dados do IMU.
     if signal_data.ndim != 2 or signal_data.shape[1] != 3:
-        print(f"  AVISO: Sinal IMU para {base_filename} não tem 3 eixos (shape: {signal_data.shape}). Pulando plotagem.")
-        return
+        return f"  AVISO: Sinal IMU para {base_filename} não tem 3 eixos (shape: {signal_data.shape}). Pulando plotagem."
 
     # Lógica de "zooming".
     if SAMPLES_TO_PLOT is not None and SAMPLES_TO_PLOT > 0 and len(signal_data) > SAMPLES_TO_PLOT:
-        signal_to_plot = signal_data[:SAMPLES_TO_PLOT]
+        signal_to_plot = np.asarray(signal_data[:SAMPLES_TO_PLOT])
         zoom_info = f"(Primeiras {len(signal_to_plot)} Amostras)"
     else:
         signal_to_plot = signal_data
         zoom_info = "(Sinal Completo)"
 
-    time_axis = np.arange(len(signal_to_plot)) / FS
+    time_axis = get_time_axis(len(signal_to_plot))
 
-    # Cria a figura e plota cada um dos 3 eixos.
-    plt.figure(figsize=(15, 5))
-    plt.plot(time_axis, signal_to_plot[:, 0], label='Eixo X', color='royalblue', alpha=0.9)
-    plt.plot(time_axis, signal_to_plot[:, 1], label='Eixo Y', color='forestgreen', alpha=0.9)
-    plt.plot(time_axis, signal_to_plot[:, 2], label='Eixo Z', color='darkorange', alpha=0.9)
+    # Obtém a figura reutilizável (já limpa) e plota cada um dos 3 eixos. Cada eixo
+    # é reduzido separadamente para o desenho, preservando seus próprios picos.
+    fig, ax = get_clean_axes(FIGURE_SIZE)
+    for axis_index, (label, color) in enumerate([('Eixo X', 'royalblue'),
+                                                 ('Eixo Y', 'forestgreen'),
+                                                 ('Eixo Z', 'darkorange')]):
+        ax.plot(*minmax_decimate(time_axis, signal_to_plot[:, axis_index]), label=label, color=color, alpha=0.9)
     
-    plt.title(f'Sinal IMU Pré-filtrado: {base_filename} {zoom_info}')
-    plt.xlabel('Tempo (s)')
-    plt.ylabel('Aceleração (g)')
-    plt.grid(True, linestyle='--', alpha=0.6)
-    plt.legend()
-    plt.tight_layout()
+    ax.set_title(f'Sinal IMU Pré-filtrado: {base_filename} {zoom_info}')
+    ax.set_xlabel('Tempo (s)')
+    ax.set_ylabel('Aceleração (g)')
+    # Grade em linha contínua (o Agg não precisa gerar o padrão tracejado segmento
+    # a segmento) e legenda em posição fixa, logo à direita do gráfico: sem a busca
+    # pela "melhor" posição, que percorre todos os pontos das 3 curvas, e sem nunca
+    # cobrir os sinais (que ocupam toda a área do gráfico).
+    ax.grid(True, linestyle='-', alpha=0.2)
+    ax.legend(loc='upper left', bbox_to_anchor=(1.0, 1.0), frameon=False)
+    fig.tight_layout()
     
     # Salva a figura.
     plot_filename = f"{base_filename}_imu_pre-filtered.png"
     save_path = os.path.join(output_dir, plot_filename)
     try:
-        plt.savefig(save_path)
-        print(f"  ✅ Gráfico IMU salvo em: {plot_filename}")
+        save_figure(fig, save_path)
+        message = f"  ✅ Gráfico IMU salvo em: {plot_filename}"
+    except Exception as e:
+        message = f"  ❌ ERRO ao salvar o gráfico IMU {save_path}: {e}"
+    return message
+
+def plot_record(ppg_filename):
+    """
+    Carrega e plota os sinais PPG e IMU brutos de um único registro.
+
+    Cada registro é independente dos demais, então esta função é executada em
+    paralelo (um registro por processo) a partir da execução principal. As
+    mensagens de status são devolvidas para serem impressas pelo processo principal.
+
+    Args:
+        ppg_filename (str): O nome do arquivo .npy (ou .npz) do PPG bruto.
+
+    Returns:
+        list: As mensagens de status geradas durante o processamento.
+    """
+    messages = []
+    # Extrai o nome base para poder encontrar o arquivo IMU correspondente
+    # (salvo no mesmo formato, .npy ou .npz, que o do PPG).
+    stem, extension = os.path.splitext(ppg_filename)
+    base_name = stem[:-len('_ppg')]
+
+    # Plota o sinal PPG.
+    try:
+        ppg_path = os.path.join(PRE_FILTERED_PPG_DIR, ppg_filename)
+        ppg_signal = load_signal(ppg_path, 'ppg')
+        messages.append(plot_ppg_signal(ppg_signal, base_name, PLOT_OUTPUT_DIR))
+    except Exception as e:
+        messages.append(f"  ❌ ERRO ao processar o arquivo PPG {ppg_filename}: {e}")
+        return messages
+
+    # Procura e plota o sinal IMU correspondente.
+    imu_filename = f"{base_name}_imu{extension}"
+    imu_path = os.path.join(PRE_FILTERED_IMU_DIR, imu_filename)
+    
+    # O arquivo é aberto diretamente (sem verificar antes se ele existe, o que custaria
+    # uma chamada 'stat' extra); a ausência do arquivo é tratada pela exceção.
+    try:
+        imu_signal = load_signal(imu_path, 'imu')
+        messages.append(plot_imu_signal(imu_signal, base_name, PLOT_OUTPUT_DIR))
+    except FileNotFoundError:
+        messages.append(f"  ℹ️  Arquivo IMU correspondente não encontrado para {base_name}.")
     except Exception as e:
-        print(f"  ❌ ERRO ao salvar o gráfico IMU {save_path}: {e}")
-    plt.close()
+        messages.append(f"  ❌ ERRO ao processar o arquivo IMU {imu_filename}: {e}")
+    return messages
 
 
 # --- 3. Execução Principal ---
@@ -131,37 +234,25 @@ if __name__ == "__main__":
     os.makedirs(PLOT_OUTPUT_DIR, exist_ok=True)
     print(f"Diretório de saída para os gráficos: {os.path.abspath(PLOT_OUTPUT_DIR)}")
 
-    # O loop principal é guiado pelos arquivos de PPG.
-    ppg_files = sorted([f for f in os.listdir(PRE_FILTERED_PPG_DIR) if f.endswith("_ppg.npy")])
+    # O loop principal é guiado pelos arquivos de PPG. Se um registro existir nos dois
+    # formatos, só um deles é plotado (ver _signal_files.py).
+    ppg_files, ignored_messages = list_signal_files(PRE_FILTERED_PPG_DIR, "_ppg")
+    for message in ignored_messages:
+        print(message)
     
     print(f"\n🔍 {len(ppg_files)} arquivos de sinal PPG encontrados para plotar.")
 
-    # Itera sobre cada arquivo PPG.
-    for ppg_filename in ppg_files:
-        # Extrai o nome base para poder encontrar o arquivo IMU correspondente.
-        base_name = ppg_filename.replace('_ppg.npy', '')
-        print(f"\n--- Processando registro: {base_name} ---")
-
-        # Plota o sinal PPG.
-        try:
-            ppg_path = os.path.join(PRE_FILTERED_PPG_DIR, ppg_filename)
-            ppg_signal = np.load(ppg_path)
-            plot_ppg_signal(ppg_signal, base_name, PLOT_OUTPUT_DIR)
-        except Exception as e:
-            print(f"  ❌ ERRO ao processar o arquivo PPG {ppg_filename}: {e}")
-            continue
-
-        # Procura e plota o sinal IMU correspondente.
-        imu_filename = f"{base_name}_imu.npy"
-        imu_path = os.path.join(PRE_FILTERED_IMU_DIR, imu_filename)
-        
-        if os.path.exists(imu_path):
-            try:
-                imu_signal = np.load(imu_path)
-                plot_imu_signal(imu_signal, base_name, PLOT_OUTPUT_DIR)
-            except Exception as e:
-                print(f"  ❌ ERRO ao processar o arquivo IMU {imu_filename}: {e}")
-        else:
-            print(f"  ℹ️  Arquivo IMU correspondente não encontrado para {base_name}.")
+    # Os registros são independentes: os gráficos de cada um são gerados e salvos em
+    # um processo separado, e as mensagens são impressas aqui, na ordem original.
+    n_processes = max(1, min(os.cpu_count() or 1, len(ppg_files)))
+    # Cada processo cria sua figura reutilizável uma única vez, ao ser iniciado.
+    with ProcessPoolExecutor(max_workers=n_processes, initializer=init_plot_worker,
+                             initargs=(FIGURE_SIZE,)) as executor:
+        results = executor.map(plot_record, ppg_files)
+        for ppg_filename, messages in zip(ppg_files, results):
+            base_name = os.path.splitext(ppg_filename)[0][:-len('_ppg')]
+            print(f"\n--- Processando registro: {base_name} ---")
+            for message in messages:
+                print(message)
 
     print(f"\n--- Plotagem Concluída ---")
\ No newline at end of file
@@ -7,9 +7,14 @@ registros de dados no formato WFDB (Waveform Database), extrai os canais de
 sinal de interesse (PPG e Acelerômetro/IMU), realiza um pré-processamento
 básico (média de canais PPG) e salva os sinais limpos no formato .npy,
 que é mais eficiente e fácil de usar nos scripts subsequentes.
+
+Os sinais são salvos em float32 (precisão simples, ~7 dígitos significativos),
+mais do que suficiente para amostras vindas de um conversor A/D: os arquivos
+ficam com metade do tamanho e são lidos duas vezes mais rápido pelas etapas seguintes.
 """
 
 import os
+from concurrent.futures import ProcessPoolExecutor
 import wfdb
 import numpy as np
 
@@ -23,6 +28,22 @@ PRE_FILTERED_PPG_DIR = "data/dataset_physionet/pre_filtered_ppg/"
 # Diretório de saída para os arquivos .npy de IMU (3 eixos).
 PRE_FILTERED_IMU_DIR = "data/dataset_physionet/pre_filtered_imu/"
 
+# --- Canais ---
+# Posição de cada eixo do acelerômetro (sufixo do nome do canal 'a_x', 'a_y', 'a_z')
+# no array do IMU salvo.
+ACC_AXIS_POSITION = {'x': 0, 'y': 1, 'z': 2}
+
+# --- Formato de Saída ---
+# Tipo numérico dos arrays salvos nos arquivos .npy.
+OUTPUT_DTYPE = np.float32
+# Tamanho do buffer de escrita (em bytes) usado ao salvar cada arquivo .npy.
+SAVE_BUFFER_SIZE = 1 << 20
+# Se True, cada sinal é salvo comprimido (zlib) em um arquivo .npz, em vez de .npy,
+# ocupando bem menos espaço em disco (útil para armazenamento de longo prazo).
+# Os arquivos .npz são lidos por passa_baixa_imu.py e plot_sinais_pre_filtrados.py,
+# mas não podem ser mapeados em memória: são descomprimidos por inteiro ao serem lidos.
+COMPRESS = False
+
 def load_and_extract_signals(record_name_base, raw_dir):
     """
     Carrega um registro WFDB, extrai e processa os sinais PPG e de Acelerômetro.
@@ -30,65 +51,157 @@ def load_and_extract_signals(record_name_base, raw_dir):
     - Para o PPG: encontra todos os canais 'PLETH' e calcula a média entre eles.
     - Para o IMU: encontra os canais 'a_x', 'a_y', 'a_z' e os empilha em um array.
 
+    As mensagens não são impressas aqui: elas são devolvidas para serem impressas
+    pelo processo principal, na ordem dos registros.
+
     Args:
         record_name_base (str): O nome base do registro (ex: 's1_run').
         raw_dir (str): O caminho para o diretório de dados brutos.
 
     Returns:
-        tuple: Uma tupla contendo (sinal_ppg_final, dados_imu, fs_real) ou (None, None, None).
+        tuple: Uma tupla contendo (sinal_ppg_final, dados_imu, fs_real, mensagens) ou
+               (None, None, None, mensagens).
     """
     record_path = os.path.join(raw_dir, record_name_base)
+    messages = []
     
     try:
-        # Carrega o registro completo usando a biblioteca WFDB.
-        record = wfdb.rdrecord(record_path)
-        signal_data = record.p_signal 
-        current_fs = record.fs
-        signal_names = record.sig_name
+        # Lê apenas o cabeçalho do registro (metadados); os sinais são lidos depois,
+        # somente para os canais de interesse.
+        header = wfdb.rdheader(record_path)
+        current_fs = header.fs
+        signal_names = header.sig_name
 
-        # Listas para coletar os sinais encontrados.
-        ppg_signals_list = []
-        acc_signals_list = []
+        # Índices (canais do registro) dos sinais encontrados.
+        ppg_indices = []
+        acc_indices = []
 
         if signal_names:
-            # Dicionário para garantir a ordem correta dos eixos do acelerômetro (X, Y, Z).
-            acc_signals_dict = {}
+            # Canal de cada eixo do acelerômetro, na ordem [X, Y, Z] (None se ausente).
+            acc_columns = [None, None, None]
 
-            # Itera sobre todos os canais disponíveis no registro.
+            # Percorre os canais uma única vez, com o nome normalizado em minúsculas.
             for i, sig_name in enumerate(signal_names):
+                sig_name = sig_name.lower()
                 # Procura por canais de PPG (qualquer um que contenha 'PLETH').
-                if 'PLETH' in sig_name.upper():
-                    ppg_signals_list.append(signal_data[:, i])
-                
-                # Procura por canais de acelerômetro (qualquer um que comece com 'a_').
-                if sig_name.lower().startswith('a_'):
-                    acc_signals_dict[sig_name.lower()] = signal_data[:, i]
-
-            # Garante a ordem [X, Y, Z] antes de criar o array final do IMU.
-            if 'a_x' in acc_signals_dict and 'a_y' in acc_signals_dict and 'a_z' in acc_signals_dict:
-                 acc_signals_list = [acc_signals_dict['a_x'], acc_signals_dict['a_y'], acc_signals_dict['a_z']]
+                if 'pleth' in sig_name:
+                    ppg_indices.append(i)
+                # Procura pelos canais de acelerômetro ('a_x', 'a_y', 'a_z').
+                if sig_name.startswith('a_') and sig_name[2:] in ACC_AXIS_POSITION:
+                    acc_columns[ACC_AXIS_POSITION[sig_name[2:]]] = i
+
+            # Os eixos do acelerômetro só são usados se os 3 existirem.
+            if all(column is not None for column in acc_columns):
+                acc_indices = acc_columns
+
+        # Nenhum canal de interesse: não há o que ler do arquivo de sinais.
+        channels = sorted(set(ppg_indices + acc_indices))
+        if not channels:
+            return None, None, current_fs, messages
+
+        # Carrega somente os canais de PPG e do acelerômetro, em vez de todos os canais
+        # do registro. As colunas de 'p_signal' seguem a ordem de 'channels', então os
+        # índices dos canais são convertidos para as posições das colunas.
+        record = wfdb.rdrecord(record_path, channels=channels)
+        signal_data = record.p_signal
+        channel_to_column = {channel: column for column, channel in enumerate(channels)}
+        ppg_indices = [channel_to_column[i] for i in ppg_indices]
+        acc_indices = [channel_to_column[i] for i in acc_indices]
 
         # --- Processamento dos Sinais Coletados ---
 
         # Processa o(s) sinal(is) PPG.
         final_ppg_signal = None
-        if ppg_signals_list:
-            print(f"  -> Encontrados {len(ppg_signals_list)} canais PPG. Calculando a média...")
-            # Empilha os canais como colunas e calcula a média para obter um sinal único e mais limpo.
-            final_ppg_signal = np.mean(np.stack(ppg_signals_list, axis=1), axis=1)
+        if ppg_indices:
+            messages.append(f"  -> Encontrados {len(ppg_indices)} canais PPG. Calculando a média...")
+            # Calcula a média dos canais para obter um sinal único e mais limpo. Os canais
+            # são somados em um único acumulador, sem montar a matriz temporária
+            # (n_amostras x n_canais) que o empilhamento das colunas exigiria.
+            final_ppg_signal = signal_data[:, ppg_indices[0]].copy()
+            for i in ppg_indices[1:]:
+                final_ppg_signal += signal_data[:, i]
+            final_ppg_signal /= len(ppg_indices)
 
         # Processa o(s) sinal(is) do acelerômetro.
         acc_data = None
-        if acc_signals_list:
-            # Empilha os 3 eixos em um único array NumPy de shape (n_amostras, 3).
-            acc_data = np.stack(acc_signals_list, axis=1)
-            print(f"  -> Sinais de acelerômetro (X,Y,Z) combinados em um array de shape: {acc_data.shape}")
+        if acc_indices:
+            # Empilha os 3 eixos em um único array NumPy contíguo de shape (n_amostras, 3),
+            # já convertido para OUTPUT_DTYPE na mesma cópia (sem um array float64
+            # intermediário a ser convertido depois, ao salvar).
+            acc_data = np.stack([signal_data[:, i] for i in acc_indices], axis=1, dtype=OUTPUT_DTYPE)
+            messages.append(f"  -> Sinais de acelerômetro (X,Y,Z) combinados em um array de shape: {acc_data.shape}")
 
-        return final_ppg_signal, acc_data, current_fs
+        return final_ppg_signal, acc_data, current_fs, messages
 
     except Exception as e:
-        print(f"  ERRO ao processar o registro {record_name_base}: {e}")
-        return None, None, None
+        messages.append(f"  ERRO ao processar o registro {record_name_base}: {e}")
+        return None, None, None, messages
+
+def save_npy(save_path, data):
+    """
+    Salva um array em um arquivo .npy através de um arquivo com buffer de escrita.
+
+    O cabeçalho do .npy e os dados são acumulados no buffer (SAVE_BUFFER_SIZE) e
+    gravados em poucas chamadas de escrita. Como os sinais são arrays numéricos,
+    a serialização via pickle é desabilitada.
+
+    Args:
+        save_path (str): O caminho do arquivo .npy de saída.
+        data (np.array): O array a ser salvo.
+    """
+    with open(save_path, 'wb', buffering=SAVE_BUFFER_SIZE) as f:
+        np.save(f, data, allow_pickle=False)
+
+def save_signal(save_path, signal_name, data):
+    """
+    Salva um sinal em .npz comprimido (se o caminho terminar em .npz) ou em .npy.
+
+    Args:
+        save_path (str): O caminho do arquivo de saída (.npy ou .npz).
+        signal_name (str): O nome do array dentro do arquivo .npz (ex: 'ppg', 'imu').
+        data (np.array): O array a ser salvo.
+    """
+    if save_path.endswith(".npz"):
+        np.savez_compressed(save_path, **{signal_name: data})
+    else:
+        save_npy(save_path, data)
+
+def extract_and_save_record(rec_name):
+    """
+    Extrai os sinais PPG e IMU de um único registro e os salva em arquivos .npy
+    (ou .npz comprimidos, se COMPRESS for True).
+
+    Cada registro é independente dos demais, então esta função é executada em
+    paralelo (um registro por processo) a partir da execução principal. Os sinais
+    são salvos pelo próprio processo, evitando transferir os arrays de volta.
+
+    Args:
+        rec_name (str): O nome base do registro (ex: 's1_run').
+
+    Returns:
+        list: As mensagens de status geradas durante o processamento.
+    """
+    final_ppg, raw_acc, actual_fs, messages = load_and_extract_signals(rec_name, RAW_DATA_DIR)
+    extension = ".npz" if COMPRESS else ".npy"
+    
+    # Bloco para salvar o sinal PPG, se ele foi encontrado.
+    if final_ppg is not None:
+        output_filename_ppg = f"{rec_name}_ppg{extension}"
+        save_path_ppg = os.path.join(PRE_FILTERED_PPG_DIR, output_filename_ppg)
+        save_signal(save_path_ppg, 'ppg', final_ppg.astype(OUTPUT_DTYPE, copy=False))
+        messages.append(f"  ✅ Sinal PPG (média) salvo em: {save_path_ppg} (fs: {actual_fs} Hz)")
+    else:
+        messages.append(f"  ℹ️  Sinal PPG não encontrado no registro {rec_name}.")
+
+    # Bloco para salvar o sinal IMU, se ele foi encontrado.
+    if raw_acc is not None:
+        output_filename_acc = f"{rec_name}_imu{extension}"
+        save_path_acc = os.path.join(PRE_FILTERED_IMU_DIR, output_filename_acc)
+        save_signal(save_path_acc, 'imu', raw_acc.astype(OUTPUT_DTYPE, copy=False))
+        messages.append(f"  ✅ Sinal IMU (3 eixos) salvo em: {save_path_acc} (fs: {actual_fs} Hz)")
+    else:
+        messages.append(f"  ℹ️  Sinal de Acelerômetro não encontrado no registro {rec_name}.")
+    return messages
 
 # --- 3. Execução Principal ---
 if __name__ == "__main__":
@@ -99,34 +212,24 @@ if __name__ == "__main__":
     print(f"Diretório de saída para IMU .npy: {os.path.abspath(PRE_FILTERED_IMU_DIR)}")
     
     # Encontra todos os registros no diretório raw procurando por arquivos de cabeçalho '.hea'.
-    record_names = sorted([os.path.splitext(f)[0] for f in os.listdir(RAW_DATA_DIR) if f.endswith(".hea")])
+    # 'os.scandir' já traz o tipo de cada entrada, sem uma chamada 'stat' extra por arquivo.
+    with os.scandir(RAW_DATA_DIR) as entries:
+        record_names = sorted([os.path.splitext(e.name)[0] for e in entries
+                               if e.is_file() and e.name.endswith(".hea")])
     if not record_names:
         print("Nenhum registro encontrado.")
         exit()
 
     print(f"\nEncontrados {len(record_names)} registros para processar.")
 
-    # Itera sobre cada registro, extrai os sinais e salva-os.
-    for rec_name in record_names:
-        print(f"\nProcessando registro: {rec_name}...")
-        final_ppg, raw_acc, actual_fs = load_and_extract_signals(rec_name, RAW_DATA_DIR)
-        
-        # Bloco para salvar o sinal PPG, se ele foi encontrado.
-        if final_ppg is not None:
-            output_filename_ppg = f"{rec_name}_ppg.npy"
-            save_path_ppg = os.path.join(PRE_FILTERED_PPG_DIR, output_filename_ppg)
-            np.save(save_path_ppg, final_ppg)
-            print(f"  ✅ Sinal PPG (média) salvo em: {save_path_ppg} (fs: {actual_fs} Hz)")
-        else:
-            print(f"  ℹ️  Sinal PPG não encontrado no registro {rec_name}.")
-
-        # Bloco para salvar o sinal IMU, se ele foi encontrado.
-        if raw_acc is not None:
-            output_filename_acc = f"{rec_name}_imu.npy"
-            save_path_acc = os.path.join(PRE_FILTERED_IMU_DIR, output_filename_acc)
-            np.save(save_path_acc, raw_acc)
-            print(f"  ✅ Sinal IMU (3 eixos) salvo em: {save_path_acc} (fs: {actual_fs} Hz)")
-        else:
-            print(f"  ℹ️  Sinal de Acelerômetro não encontrado no registro {rec_name}.")
+    # Os registros são independentes: a extração e o salvamento de cada um rodam em
+    # um processo separado, e as mensagens são impressas aqui, na ordem original.
+    n_processes = max(1, min(os.cpu_count() or 1, len(record_names)))
+    with ProcessPoolExecutor(max_workers=n_processes) as executor:
+        results = executor.map(extract_and_save_record, record_names)
+        for rec_name, messages in zip(record_names, results):
+            print(f"\nProcessando registro: {rec_name}...")
+            for message in messages:
+                print(message)
 
     print("\n--- Processamento Concluído ---")
\ No newline at end of file